@@ -0,0 +1,31 @@
+#Entry point for ML/DL run challenge web app in asgi server
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+#Optional alternative to wsgi.py: the live endpoints (/_running, /_ranking, /_waiters, /_timeleft)
+#and the /_stream events are served with asyncio, so idle polling or streaming connections
+#do not hold a server thread. Other routes are served by the Flask app.
+#
+#To run from command line, a single process (evaluator thread and run queue are per process):
+#
+#       python -m uvicorn asgi:application --workers 1
+#  or
+#       uvicorn asgi:application --host localhost --port 5000
+#
+#Needs: pip install uvicorn flask[async]
+
+import sys
+
+#This app path
+sys.path.insert(0, "/home/hdaniel/public_html/dlchan")
+sys.path.insert(0, "/home/hdaniel/public_html/dlchan/modules/deploy")
+
+#Needed to find flask and other modules
+sys.path.insert(0, "/home/hdaniel/penv/lib/python3.12/site-packages")
+
+from dlchan import app, liveData
+from asgiviews import AsgiRoutes
+
+application = AsgiRoutes(app, liveData)
@@ -0,0 +1,172 @@
+#Asyncio routes for ML/DL run challenge
+#Serves the live endpoints without holding a server thread per connection
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import asyncio, json, time
+from urllib.parse import parse_qs
+from typing import *
+from flask import Flask
+from asgiref.wsgi import WsgiToAsgi   #installed with: pip install flask[async]
+from modules.livedata import LiveData
+from modules.metrics import Metrics
+from modules.staticassets import StaticAssets
+
+
+class AsgiRoutes:
+    '''
+    ASGI application serving /_running, /_ranking, /_waiters and /_timeleft with asyncio
+    plus /_stream, a server sent events stream of the /_running data.
+    Any other route is passed to the Flask (WSGI) app.
+
+    Payloads are built by the same LiveData instance used by views.Routes,
+    so both entry points share the Evaluator EvaluationProgess, ScoreTable and RunQueue
+    '''
+
+    def __init__(self, app:Flask, liveData:LiveData, streamPeriod:float=0.1) -> None:
+        self._wsgi         = WsgiToAsgi(app)
+        self._liveData     = liveData
+        self._streamPeriod = streamPeriod    #same as running.html poll interval
+
+        #payload builder from the query arguments: dict, or JSON bytes already encoded,
+        #None if not found, and True if it reads files (run in a worker thread)
+        self._routes : Dict[str, Tuple[Callable[[Dict[str, str]], Union[Dict, bytes, None]], bool]] = {
+            '/_timeleft': (lambda args: liveData.timeleft(), False),
+            '/_waiters' : (lambda args: liveData.waiters(),  True),
+            '/_ranking' : (lambda args: liveData.ranking(args.get('set')), True),
+            '/_running' : (lambda args: liveData.running(),  True),
+        }
+
+        #stream broadcaster state: one producer for all connected clients
+        self._streamTask : Optional[asyncio.Task] = None
+        self._streamData : bytes = b''
+        self._streamTick : Optional[asyncio.Event] = None
+        self._streamClients : int = 0
+
+
+    async def __call__(self, scope:Dict, receive:Callable, send:Callable) -> None:
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if scope['type'] == 'http':
+            path = scope['path']
+            root = scope.get('root_path', '')
+            if root and path.startswith(root):
+                path = path[len(root):]
+
+            if path in self._routes:
+                return await self._json(path, scope, receive, send)
+            if path == '/_stream':
+                return await self._stream(receive, send)
+
+        return await self._wsgi(scope, receive, send)
+
+
+    ############################
+    #         routes           #
+    ############################
+    async def _json(self, path:str, scope:Dict, receive:Callable, send:Callable) -> None:
+        start = time.perf_counter()
+        build, blocking = self._routes[path]
+        args = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()}
+        if blocking:
+            data = await asyncio.to_thread(build, args)
+        else:
+            data = build(args)
+        if data is None:
+            await self._send(send, 404, 'application/json', self._encode(dict(error='unknown dataset')))
+        else:
+            body = data if isinstance(data, bytes) else self._encode(data)
+            headers = dict(scope.get('headers', []))
+            gz = StaticAssets.compress(body, headers.get(b'accept-encoding', b'').decode('latin-1'))
+            if gz is not None:
+                await self._send(send, 200, 'application/json', gz, [(b'content-encoding', b'gzip'),
+                                                                       (b'vary', b'Accept-Encoding')])
+            else:
+                await self._send(send, 200, 'application/json', body)
+        Metrics.route(path, time.perf_counter()-start)
+
+
+    async def _stream(self, receive:Callable, send:Callable) -> None:
+        '''
+        Server sent events with /_running data,
+        sent only when it changes and at most once every streamPeriod seconds
+        '''
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache')]})
+
+        self._streamClients += 1
+        if self._streamTask is None or self._streamTask.done():
+            self._streamTick = asyncio.Event()
+            self._streamTask = asyncio.create_task(self._broadcaster())
+
+        disconnected = asyncio.create_task(self._waitDisconnect(receive))
+        try:
+            sent = None
+            while not disconnected.done():
+                tick = self._streamTick
+                data = self._streamData
+                if data and data is not sent:
+                    await send({'type': 'http.response.body',
+                                'body': b'data: ' + data + b'\n\n', 'more_body': True})
+                    sent = data
+
+                #idle until new data is published or the client leaves
+                ticked = asyncio.create_task(tick.wait())
+                await asyncio.wait([disconnected, ticked], return_when=asyncio.FIRST_COMPLETED)
+                ticked.cancel()
+        finally:
+            self._streamClients -= 1
+            disconnected.cancel()
+
+
+    async def _broadcaster(self) -> None:
+        '''Build /_running data once per period for all stream clients'''
+        while self._streamClients > 0:
+            data = await asyncio.to_thread(self._liveData.running)
+            if data != self._streamData:
+                self._streamData = data
+                tick, self._streamTick = self._streamTick, asyncio.Event()
+                tick.set()
+            await asyncio.sleep(self._streamPeriod)
+
+
+    ############################
+    #        helpers           #
+    ############################
+    @staticmethod
+    async def _waitDisconnect(receive:Callable) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+
+    @staticmethod
+    async def _lifespan(receive:Callable, send:Callable) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+    @staticmethod
+    async def _send(send:Callable, status:int, contentType:str, body:bytes,
+                    headers:Optional[List[Tuple[bytes, bytes]]]=None) -> None:
+        headers = headers or []
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', contentType.encode()),
+                                (b'content-length', str(len(body)).encode())] + headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+    @staticmethod
+    def _encode(data:Dict) -> bytes:
+        #default=float handles numpy scalars in accuracy histories
+        return json.dumps(data, default=float, separators=(',', ':')).encode()
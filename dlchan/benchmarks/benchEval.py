@@ -0,0 +1,203 @@
+#Evaluation pipeline benchmark for ML/DL run challenge
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+#Times the stages of Evaluator.evaluatorThread on synthetic data and models
+#and reports the peak memory of each stage. Run from the dlchan folder:
+#
+#       python benchmarks/benchEval.py -o bench.json
+#  compare with a saved run, exit code 1 if any stage is slower than threshold:
+#       python benchmarks/benchEval.py -o new.json -b bench.json -t 0.10
+#  only some cases:
+#       python benchmarks/benchEval.py -c dense-ch1 logreg-ch3
+
+import argparse, json, os, pickle, platform, resource, statistics, sys, tempfile, time, tracemalloc
+from datetime import datetime
+from typing import *
+
+#Same paths as wsgi.py, relative to this file
+__APP_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, __APP_FOLDER)
+sys.path.insert(0, os.path.join(__APP_FOLDER, 'modules/deploy'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from filelock import FileLock
+from modelsel import ModelSelect
+from modules.evalhist import EvalHist
+from modules.evalprog import EvaluationProgess
+from modules.evaluator import Evaluator
+from modules.mdlRkEvKeras import ModelRkEvKeras
+from modules.mdlRkEvSKL import ModelRkEvSKL
+from modules.runqueue import RunQueue
+from modules.score import ScoreTable, ScoreRank
+from synthetic import SyntheticData, SyntheticModels
+
+
+CLASSES  = 7          # noClasses in dlchan.cfg
+MODELS   = ['dense', 'conv1d', 'conv2d', 'logreg', 'forest', 'knn']
+CHANNELS = [1, 3]     # noChannels in dlchan.cfg: single channel and 3D xyz
+STAGES   = ['model_load', 'dataset_shape', 'inference']
+
+
+class BenchEval:
+    '''
+    Run each (model, channels) case: time stages repeat times (median and min),
+    then run each stage once more with tracemalloc to get its peak memory
+    '''
+
+    def __init__(self, folder:str, points:int, samplesClass:int, repeat:int, seed:int) -> None:
+        self._folder       = folder
+        self._points       = points
+        self._samplesClass = samplesClass
+        self._repeat       = repeat
+        self._seed         = seed
+        self._modelSel     = ModelSelect([ModelRkEvKeras(), ModelRkEvSKL()])
+
+
+    def _evaluator(self, channels:int) -> Evaluator:
+        '''Evaluator on a synthetic eval dataset, stored as the app stores it'''
+        X, y = SyntheticData.dataset(CLASSES, channels, self._points, self._samplesClass, self._seed+1)
+        evalFN = os.path.join(self._folder, f'eval-ch{channels}.pickle')
+        with open(evalFN, 'wb') as f:
+            pickle.dump(X, f)
+            pickle.dump(y, f)
+
+        lock = lambda name: FileLock(os.path.join(self._folder, name), thread_local=False)
+        runQueue   = RunQueue  (os.path.join(self._folder, 'runqueue.pickle'),   lock('queue.lock'))
+        scoreLock  = lock('score.lock')
+        scoreTable = ScoreTable(os.path.join(self._folder, 'scoretable.pickle'), scoreLock)
+        evalHist   = EvalHist  (os.path.join(self._folder, 'evalhist.csv'),      lock('hist.lock'))
+        return Evaluator(self._modelSel, runQueue, EvaluationProgess(), scoreTable, scoreLock,
+                         evalHist, self._folder, self._folder, evalFN, CLASSES, channels, 1)
+
+
+    def _modelFile(self, kind:str, channels:int) -> str:
+        #models take half the dataset points, as in the challenge, so the dataset is reshaped
+        inputLen = self._points // 2
+        if kind in ('dense', 'conv1d', 'conv2d'):
+            model = SyntheticModels.keras(kind, inputLen, channels, CLASSES, self._seed)
+        else:
+            X, y = SyntheticData.dataset(CLASSES, channels, inputLen, self._samplesClass, self._seed)
+            model = SyntheticModels.sklearn(kind, X, y, self._seed)
+        return SyntheticModels.save(model, self._folder, f'{kind}-ch{channels}')
+
+
+    def _stages(self, evaluator:Evaluator, modelFN:str) -> Tuple[Dict[str, Callable[[], None]], Dict]:
+        '''stage functions, each one uses the output of the previous'''
+        state = {}
+
+        def modelLoad():
+            state['model'] = self._modelSel.fromFile(modelFN)
+
+        def datasetShape():
+            state['X'], state['y'] = evaluator.shapeDataset(state['model'], modelFN)
+
+        def inference():
+            rank = ScoreRank(evaluator._scoreTable)
+            loss, acc, accHist = evaluator.evaluate(state['model'], state['X'], state['y'], rank)
+            if acc < 0:
+                raise RuntimeError(f'evaluation failed for {modelFN}')
+            state['acc'] = acc
+
+        return {'model_load': modelLoad, 'dataset_shape': datasetShape, 'inference': inference}, state
+
+
+    def run(self, kind:str, channels:int) -> Dict:
+        evaluator = self._evaluator(channels)
+        modelFN   = self._modelFile(kind, channels)
+        stages, state = self._stages(evaluator, modelFN)
+
+        times = {s: [] for s in STAGES}
+        for r in range(self._repeat):
+            for s in STAGES:
+                start = time.perf_counter()
+                stages[s]()
+                times[s].append(time.perf_counter() - start)
+
+        peaks = {}
+        for s in STAGES:
+            tracemalloc.start()
+            stages[s]()
+            peaks[s] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        samples = state['X'].shape[0]
+        result = {s: {'median_s': statistics.median(times[s]), 'min_s': min(times[s]),
+                      'peak_bytes': peaks[s]} for s in STAGES}
+        result['samples']         = samples
+        result['samples_per_sec'] = samples / statistics.median(times['inference'])
+        result['accuracy']        = state['acc']
+        return result
+
+
+def meta(args:argparse.Namespace) -> Dict:
+    versions = {'python': platform.python_version(), 'numpy': np.__version__}
+    for name in ('keras', 'tensorflow', 'sklearn'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    return {'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'host': platform.node(),
+            'cpus': os.cpu_count(), 'versions': versions,
+            'points': args.points, 'samplesClass': args.samples, 'repeat': args.repeat, 'seed': args.seed}
+
+
+def compare(results:Dict, baseline:Dict, threshold:float) -> List[str]:
+    '''list of stages slower than baseline by more than threshold (fraction)'''
+    regressions = []
+    for case, stages in results.items():
+        for s in STAGES:
+            try:
+                old = baseline[case][s]['median_s']
+            except KeyError:
+                continue
+            new = stages[s]['median_s']
+            if old > 0 and new > old*(1+threshold):
+                regressions.append(f'{case} {s}: {old:.4f}s -> {new:.4f}s (+{(new/old-1)*100:.1f}%)')
+    return regressions
+
+
+def main() -> int:
+    cases = [f'{m}-ch{c}' for m in MODELS for c in CHANNELS]
+
+    parser = argparse.ArgumentParser(description='Evaluation pipeline benchmark')
+    parser.add_argument('-c', '--cases',   nargs='*', default=cases, choices=cases)
+    parser.add_argument('-o', '--output',  default='bench.json', help='results JSON file')
+    parser.add_argument('-b', '--baseline',default=None, help='baseline JSON file to compare with')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10, help='allowed slow down, 0.10 = 10%%')
+    parser.add_argument('-r', '--repeat',  type=int, default=3)
+    parser.add_argument('--points',  type=int, default=1000, help='points per channel in each sample')
+    parser.add_argument('--samples', type=int, default=500,  help='samples per class')
+    parser.add_argument('--seed',    type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='dlbench-') as folder:
+        bench = BenchEval(folder, args.points, args.samples, args.repeat, args.seed)
+        for case in args.cases:
+            kind, ch = case.rsplit('-ch', 1)
+            results[case] = bench.run(kind, int(ch))
+            r = results[case]
+            print(f'{case:12s}', '  '.join(f'{s} {r[s]["median_s"]:.4f}s {r[s]["peak_bytes"]/2**20:.1f}MiB'
+                                           for s in STAGES), f'{r["samples_per_sec"]:.0f} samples/s')
+
+    info = meta(args)
+    info['maxrss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(args.output, 'w') as f:
+        json.dump({'meta': info, 'results': results}, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print('REGRESSION', r)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
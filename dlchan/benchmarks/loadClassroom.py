@@ -0,0 +1,297 @@
+#Classroom load test for ML/DL run challenge web app and evaluator
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+#Starts the Flask app from dlchan.py in temporary data folders and simulates a class:
+#M browsers polling the live routes at the templates intervals while models are uploaded.
+#Reports per route latency percentiles and errors, queue wait and time to ranked.
+#Runs offline, from the dlchan folder:
+#
+#       python benchmarks/loadClassroom.py -m 60 -u 6 -d 300
+#  (60 browsers, 6 uploads per minute, 5 minutes)
+#       python benchmarks/loadClassroom.py -m 60 -u 6 -d 300 -o load.json
+
+import argparse, http.client, json, os, pickle, random, re, shutil, socket
+import subprocess, sys, tempfile, threading, time, uuid
+from datetime import datetime, timedelta
+from typing import *
+
+__APP_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SyntheticData, SyntheticModels
+
+
+#Poll intervals in seconds, from templates: running.html, waiting.html, ranking.html, timeleft.html
+POLLERS = {'/_running': 0.1, '/_waiters': 0.25, '/_ranking': 1.0, '/_timeleft': 1.0}
+CLASSES = 7
+
+
+class Recorder:
+    '''Thread safe store of latencies, errors and first seen times of uploaded tags'''
+
+    def __init__(self) -> None:
+        self._lock      = threading.Lock()
+        self.latency    : Dict[str, List[float]] = {p: [] for p in POLLERS}
+        self.errors     : Dict[str, int] = {p: 0 for p in POLLERS}
+        self.late       : Dict[str, int] = {p: 0 for p in POLLERS}
+        self.uploaded   : Dict[str, float] = {}   # tag: upload time
+        self.uploadErr  : int = 0
+        self.started    : Dict[str, float] = {}   # tag: first seen in /_running
+        self.ranked     : Dict[str, float] = {}   # tag: first seen in /_ranking
+
+    def request(self, path:str, seconds:float, ok:bool, late:bool) -> None:
+        with self._lock:
+            self.latency[path].append(seconds)
+            if not ok: self.errors[path] += 1
+            if late:   self.late[path]   += 1
+
+    def seen(self, table:Dict[str, float], tags:Iterable[str], now:float) -> None:
+        with self._lock:
+            for tag in tags:
+                if tag in self.uploaded and tag not in table:
+                    table[tag] = now
+
+
+def percentiles(values:List[float]) -> Dict[str, float]:
+    if len(values) == 0:
+        return {}
+    s = sorted(values)
+    q = lambda p: s[min(int(p*len(s)), len(s)-1)]
+    return {'p50': q(0.50), 'p95': q(0.95), 'p99': q(0.99), 'max': s[-1]}
+
+
+class Classroom:
+
+    def __init__(self, port:int, browsers:int, uploadRate:float, duration:float,
+                       drain:float, seed:int) -> None:
+        self._port       = port
+        self._browsers   = browsers
+        self._uploadRate = uploadRate   # uploads per minute
+        self._duration   = duration
+        self._drain      = drain
+        self._rng        = random.Random(seed)
+        self._seed       = seed
+        self._stop       = threading.Event()   # stop polling
+        self._stopUpload = threading.Event()
+        self._rec        = Recorder()
+
+
+    ############################
+    #   app in temp folders    #
+    ############################
+    def setupFolders(self, root:str, points:int, samplesClass:int) -> None:
+        data = os.path.join(root, 'data')
+        os.makedirs(os.path.join(root, 'uploads/best'))
+        os.makedirs(data)
+
+        for name, seed in (('train.pickle', self._seed), ('eval.pickle', self._seed+1)):
+            X, y = SyntheticData.dataset(CLASSES, 1, points, samplesClass, seed)
+            with open(os.path.join(data, name), 'wb') as f:
+                pickle.dump(X, f)
+                pickle.dump(y, f)
+
+        #repo config with load test datasets and a far end date
+        with open(os.path.join(__APP_FOLDER, 'data/dlchan.cfg')) as f:
+            cfg = f.read()
+        end = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+        for key, value in (('trainDatasetFile', '"train.pickle"'), ('evalDatasetFile', '"eval.pickle"'),
+                           ('noChannels', '1'), ('endDate', end)):
+            cfg = re.sub(rf'^({key}\s*=\s*)[^#\n]*', rf'\g<1>{value} ', cfg, flags=re.M)
+        with open(os.path.join(data, 'dlchan.cfg'), 'w') as f:
+            f.write(cfg)
+
+
+    def startApp(self, root:str, tmp:str) -> subprocess.Popen:
+        env = os.environ.copy()
+        env['DLCHAN_ROOT'] = root
+        env['DLCHAN_TMP']  = tmp
+        env['PYTHONPATH']  = os.pathsep.join([__APP_FOLDER, os.path.join(__APP_FOLDER, 'modules/deploy'),
+                                              env.get('PYTHONPATH', '')])
+        cmd = [sys.executable, '-m', 'flask', '--app', 'dlchan', 'run',
+               '--port', str(self._port), '--with-threads']
+        server = subprocess.Popen(cmd, cwd=__APP_FOLDER, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        #wait until app loaded: imports tensorflow and the eval dataset
+        deadline = time.time() + 180
+        while time.time() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError('app exited, check: ' + os.path.join(root, 'data/dlchan.log'))
+            try:
+                self._get('/_timeleft')
+                return server
+            except OSError:
+                time.sleep(0.5)
+        server.kill()
+        raise RuntimeError('app did not start')
+
+
+    ############################
+    #         clients          #
+    ############################
+    def _connection(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection('127.0.0.1', self._port, timeout=30)
+
+    def _get(self, path:str) -> Tuple[int, bytes]:
+        conn = self._connection()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        finally:
+            conn.close()
+
+
+    def poller(self, path:str, interval:float) -> None:
+        '''one browser polling one route with setInterval: fixed rate, late if previous did not finish'''
+        time.sleep(self._rng.uniform(0, interval))  #browsers are not in phase
+        nextTick = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            late  = start - nextTick > interval
+            try:
+                status, body = self._get(path)
+                ok = status == 200
+            except (OSError, http.client.HTTPException):
+                ok, body = False, b''
+            now = time.perf_counter()
+            self._rec.request(path, now-start, ok, late)
+
+            if ok and path == '/_running':
+                self._rec.seen(self._rec.started, [json.loads(body)['tag']], now)
+            elif ok and path == '/_ranking':
+                self._rec.seen(self._rec.ranked, [e[0] for e in json.loads(body)['rank']], now)
+
+            nextTick += interval
+            self._stop.wait(max(0, nextTick - time.perf_counter()))
+
+
+    def uploader(self, modelFNs:List[str]) -> None:
+        '''Poisson arrivals of uploads with unique tags'''
+        n = 0
+        while not self._stopUpload.wait(self._rng.expovariate(self._uploadRate/60)):
+            src = self._rng.choice(modelFNs)
+            ext = src.rsplit('.', 1)[1]
+            tag = f'load{n:04d}-' + os.path.basename(src).rsplit('.', 1)[0]
+            n += 1
+            with open(src, 'rb') as f:
+                ok = self._upload(f'{tag}.{ext}', f.read())
+            if ok:
+                with self._rec._lock:
+                    self._rec.uploaded[tag] = time.perf_counter()
+            else:
+                self._rec.uploadErr += 1
+
+
+    def _upload(self, filename:str, content:bytes) -> bool:
+        boundary = uuid.uuid4().hex
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n').encode() + content + \
+               f'\r\n--{boundary}--\r\n'.encode()
+        conn = self._connection()
+        try:
+            conn.request('POST', '/', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+            resp = conn.getresponse()
+            return resp.status == 200 and b'Model uploaded' in resp.read()
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            conn.close()
+
+
+    ############################
+    #           run            #
+    ############################
+    def run(self, modelFNs:List[str]) -> Dict:
+        threads = [threading.Thread(target=self.poller, args=[p, i], daemon=True)
+                   for b in range(self._browsers) for p, i in POLLERS.items()]
+        uploader = threading.Thread(target=self.uploader, args=[modelFNs], daemon=True)
+        for t in threads: t.start()
+        uploader.start()
+
+        time.sleep(self._duration)
+        #stop uploads, keep polling while the queue drains
+        self._stopUpload.set()
+        uploader.join()
+        deadline = time.time() + self._drain
+        while time.time() < deadline and len(self._rec.ranked) < len(self._rec.uploaded):
+            time.sleep(1)
+        self._stop.set()
+        for t in threads: t.join(timeout=35)
+        return self.report()
+
+
+    def report(self) -> Dict:
+        rec = self._rec
+        routes = {p: {'requests': len(rec.latency[p]), 'errors': rec.errors[p], 'late': rec.late[p],
+                      'latency_s': percentiles(rec.latency[p])} for p in POLLERS}
+        queueWait = [rec.started[t] - rec.uploaded[t] for t in rec.started]
+        toRanked  = [rec.ranked[t]  - rec.uploaded[t] for t in rec.ranked]
+        return {'routes': routes,
+                'uploads': {'accepted': len(rec.uploaded), 'errors': rec.uploadErr,
+                            'ranked': len(toRanked),
+                            'queue_wait_s': percentiles(queueWait),
+                            'time_to_ranked_s': percentiles(toRanked)}}
+
+
+def freePort() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Classroom load test')
+    parser.add_argument('-m', '--browsers', type=int,   default=60,  help='browsers polling the live routes')
+    parser.add_argument('-u', '--uploads',  type=float, default=6,   help='uploads per minute')
+    parser.add_argument('-d', '--duration', type=float, default=300, help='seconds')
+    parser.add_argument('--drain',   type=float, default=300, help='max seconds to wait for queued models')
+    parser.add_argument('--models',  nargs='*', default=['dense', 'conv1d', 'logreg', 'forest', 'knn'])
+    parser.add_argument('--points',  type=int, default=1000, help='points per sample')
+    parser.add_argument('--samples', type=int, default=500,  help='samples per class')
+    parser.add_argument('--port',    type=int, default=0)
+    parser.add_argument('--seed',    type=int, default=0)
+    parser.add_argument('-o', '--output', default=None, help='report JSON file')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='dlload-')
+    tmp  = tempfile.mkdtemp(prefix='dlload-lock-')
+    try:
+        classroom = Classroom(args.port or freePort(), args.browsers, args.uploads,
+                              args.duration, args.drain, args.seed)
+        classroom.setupFolders(root, args.points, args.samples)
+
+        models = os.path.join(tmp, 'models')
+        os.makedirs(models)
+        X, y = SyntheticData.dataset(CLASSES, 1, args.points, args.samples, args.seed)
+        modelFNs = []
+        for kind in args.models:
+            if kind in ('dense', 'conv1d', 'conv2d'):
+                model = SyntheticModels.keras(kind, args.points, 1, CLASSES, args.seed)
+            else:
+                model = SyntheticModels.sklearn(kind, X, y, args.seed)
+            modelFNs.append(SyntheticModels.save(model, models, kind))
+
+        server = classroom.startApp(root, tmp)
+        try:
+            report = classroom.run(modelFNs)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(tmp,  ignore_errors=True)
+
+    report['config'] = vars(args)
+    print(json.dumps(report, indent=2))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
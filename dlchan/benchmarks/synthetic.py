@@ -0,0 +1,112 @@
+#Synthetic datasets and reference models for ML/DL run challenge benchmarks
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import os
+import numpy as np
+from typing import *
+from numpy.typing import NDArray
+
+
+class SyntheticData:
+    '''
+    Datasets with the layout of the evaluation datasets in dlchan.cfg:
+    samples sorted by class, channels appended along the columns,
+    one hot encoded uint8 labels
+    '''
+
+    @classmethod
+    def dataset(cls, classes:int=7, channels:int=1, points:int=500, samplesClass:int=200,
+                     seed:int=0) -> Tuple[NDArray, NDArray]:
+        '''
+        Each class is a sine with a class dependent frequency plus noise,
+        so that models do not evaluate to a constant prediction
+        '''
+        rng = np.random.default_rng(seed)
+        t   = np.arange(points, dtype=np.float32) / points
+
+        X = np.empty((classes*samplesClass, channels*points), dtype=np.float32)
+        y = np.zeros((classes*samplesClass, classes), dtype=np.uint8)
+        for c in range(classes):
+            rows = slice(c*samplesClass, (c+1)*samplesClass)
+            for ch in range(channels):
+                cols  = slice(ch*points, (ch+1)*points)
+                phase = rng.uniform(0, 2*np.pi, (samplesClass, 1)).astype(np.float32)
+                X[rows, cols] = np.sin(2*np.pi*(c+1+ch)*t + phase)
+            y[rows, c] = 1
+        X += rng.normal(0, 0.5, X.shape).astype(np.float32)
+        return X, y
+
+
+class SyntheticModels:
+    '''
+    Small reference models saved in the upload formats: Keras *.keras and SKLearn *.pickle
+    Keras models are compiled but not trained, SKLearn models are fitted on (X, y)
+    '''
+
+    @classmethod
+    def keras(cls, kind:str, inputLen:int, channels:int, classes:int, seed:int=0) -> Any:
+        import keras
+        from keras import layers
+        keras.utils.set_random_seed(seed)
+
+        if kind == 'dense':
+            model = keras.Sequential([
+                layers.Input(shape=(inputLen*channels,)),
+                layers.Dense(64, activation='relu'),
+                layers.Dense(classes, activation='softmax')])
+        elif kind == 'conv1d':
+            model = keras.Sequential([
+                layers.Input(shape=(inputLen*channels,)),
+                layers.Reshape((inputLen*channels, 1)),
+                layers.Conv1D(16, 9, strides=2, activation='relu'),
+                layers.MaxPool1D(4),
+                layers.Conv1D(32, 5, activation='relu'),
+                layers.GlobalAveragePooling1D(),
+                layers.Dense(classes, activation='softmax')])
+        elif kind == 'conv2d':
+            #2D models get (samples, points, channels, maps), see Datastore.splitStackChan
+            model = keras.Sequential([
+                layers.Input(shape=(inputLen, channels, 1)),
+                layers.Conv2D(16, (9, 1), strides=(2, 1), activation='relu'),
+                layers.MaxPool2D((4, 1)),
+                layers.Conv2D(32, (5, channels), activation='relu'),
+                layers.GlobalAveragePooling2D(),
+                layers.Dense(classes, activation='softmax')])
+        else:
+            raise ValueError(f'unknown keras model: {kind}')
+
+        model.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+        return model
+
+
+    @classmethod
+    def sklearn(cls, kind:str, X:NDArray, y:NDArray, seed:int=0) -> Any:
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.neighbors import KNeighborsClassifier
+
+        if   kind == 'logreg':  model = LogisticRegression(max_iter=200, random_state=seed)
+        elif kind == 'forest':  model = RandomForestClassifier(n_estimators=50, random_state=seed)
+        elif kind == 'knn':     model = KNeighborsClassifier(n_neighbors=5)
+        else:
+            raise ValueError(f'unknown sklearn model: {kind}')
+
+        model.fit(X, np.argmax(y, axis=1))
+        return model
+
+
+    @classmethod
+    def save(cls, model:Any, folder:str, name:str) -> str:
+        '''save as an uploaded file would be, returns filename'''
+        if hasattr(model, 'save'):
+            fn = os.path.join(folder, name + '.keras')
+            model.save(fn)
+        else:
+            import pickle
+            fn = os.path.join(folder, name + '.pickle')
+            with open(fn, 'wb') as f:
+                pickle.dump(model, f)
+        return fn
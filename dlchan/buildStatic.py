@@ -0,0 +1,16 @@
+#Precompress static files for ML/DL run challenge web app
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+#Run from the app folder after deploying or changing static files:
+#       python buildStatic.py
+#writes a .gz next to each js, css, ... file, served to browsers accepting gzip
+
+from modules.staticassets import StaticAssets
+
+written = StaticAssets.build('static')
+for fn, size, gzSize in written:
+    print(f'{fn:40s} {size:8d} -> {gzSize:8d} bytes')
+print('total', sum(w[1] for w in written), '->', sum(w[2] for w in written), 'bytes')
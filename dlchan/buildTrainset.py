@@ -0,0 +1,22 @@
+#Write the train dataset download variants for ML/DL run challenge web app
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+#Run from the app folder after changing the train dataset:
+#       python buildTrainset.py
+#writes <trainDatasetFile>.gz and <trainDatasetFile>.npz in the data folder,
+#served by /traindataset?format=gz and ?format=npz,
+#and the .etag file of each one, so the server does not hash them
+
+import os, tomllib
+from modules.download import FileDownload
+
+with open('data/dlchan.cfg', 'rb') as f:
+    cfgData = tomllib.load(f)
+
+trainFN = os.path.join('data', cfgData['trainDatasetFile'])
+print(f'{trainFN:50s} {os.path.getsize(trainFN):12d} bytes')
+for fn, size in FileDownload.build(trainFN):
+    print(f'{fn:50s} {size:12d} bytes')
@@ -7,18 +7,28 @@
 #https://code.visualstudio.com/docs/python/tutorial-flask
 
 from flask import Flask
-import os, secrets, sys
-from filelock import FileLock
+import atexit, os, re, secrets, sys
+from filelock import FileLock, Timeout
 from threading import Thread
 import tomllib
 from modules.evalhist import EvalHist
 from modules.flasklog import FlaskLog
 from modules.evaluator import Evaluator
+from modules.evalwatchdog import EvalWatchdog
+from modules.batchtune import BatchTuner
+from modules.evalsets import EvalSet
+from modules.curvestore import CurveStore
 from modules.mdlRkEvKeras import ModelRkEvKeras
 from modules.mdlRkEvSKL import ModelRkEvSKL
 from modules.runqueue import RunQueue
+from modules.queuepolicy import QueuePolicy, JobEstimator
 from modules.evalprog import EvaluationProgess  
+from modules.evalprogupdate import EvalProgressUpdate
+from modules.evalprogshm import SharedEvaluationProgess
 from modules.score import ScoreTable
+from modules.livedata import LiveData
+from modules.staticassets import StaticAssets
+from modules.download import FileDownload
 #from modules.modelsel import ModelSelect
 from modelsel   import ModelSelect
     
@@ -35,8 +45,9 @@ from modelsel   import ModelSelect
 #hard coded paths
 #__ROOT_FOLDER        = os.getcwd()
 #Needed to specify folder, since running in apache os.getcwd() returns: '/'
-__ROOT_FOLDER        = '/home/hdaniel/public_html/dlchan/'
-__TMP_FOLDER         = '/tmp'
+#Can be overridden with environment variables, eg: to run the load tests in temporary folders
+__ROOT_FOLDER        = os.environ.get('DLCHAN_ROOT', '/home/hdaniel/public_html/dlchan/')
+__TMP_FOLDER         = os.environ.get('DLCHAN_TMP',  '/tmp')
 __UPLOAD_FOLDER      = os.path.join(__ROOT_FOLDER, 'uploads')
 __BEST_MODELS_FOLDER = os.path.join(__ROOT_FOLDER, 'uploads/best')
 __DATA_FOLDER        = os.path.join(__ROOT_FOLDER, 'data')
@@ -46,9 +57,14 @@ __HOME_PAGE_FN       = 'home.html'
 __SCORE_TABLE_FN     = os.path.join(__DATA_FOLDER, 'scoretable.pickle') 
 __RUN_QUEUE_FN       = os.path.join(__DATA_FOLDER, 'runqueue.pickle')
 __EVAL_HIST_FN       = os.path.join(__DATA_FOLDER, 'evalhist.csv')
+__CURVE_BLOB_FN      = os.path.join(__DATA_FOLDER, 'curves.f32')
+__CURVE_INDEX_FN     = os.path.join(__DATA_FOLDER, 'curves.idx')
 __SCORE_LOCK_FN      = os.path.join(__TMP_FOLDER, 'dlscore.lock')
 __QUEUE_LOCK_FN      = os.path.join(__TMP_FOLDER, 'dlqueue.lock')
 __HIST_LOCK_FN       = os.path.join(__TMP_FOLDER, 'dlhist.lock')
+__EVAL_LOCK_FN       = os.path.join(__TMP_FOLDER, 'dleval.lock')
+__CURVE_LOCK_FN      = os.path.join(__TMP_FOLDER, 'dlcurve.lock')
+__QUEUE_NOTIFY_FN    = os.path.join(__TMP_FOLDER, 'dlqueue.sock')
 
 
 #Import config from file
@@ -61,19 +77,52 @@ __EVAL_DATASET_FN  = os.path.join(__DATA_FOLDER, cfgData['evalDatasetFile'])
 __CLASSES_DATASET  = cfgData['noClasses']
 __CHANNELS_DATASET = cfgData['noChannels']
 __MAPS_DATASET     = cfgData['noMaps']
+__EVAL_SETS        = cfgData['evalSets']    #additional evaluation datasets: {name: file}
 __MAX_MODEL_SIZE   = cfgData['maxModelSize']
 __CHALLENGE_END    = cfgData['endDate']
-__EVAL_PERIOD      = cfgData['evalPeriod']  #period to check RUNQUEUE in seconds
+__EVAL_PERIOD      = cfgData['evalPeriod']  #max period to check RUNQUEUE in seconds
+__TOP_HIST_POINTS  = cfgData['topHistPoints'] #top runner history points in the running chart
+__BLINK_PERIOD     = cfgData['blinkPeriod'] #seconds to blink the evaluated model score table position
+__PREFETCH_BUDGET  = cfgData['prefetchMemory']*1024*1024  #MiB to load next models while evaluating
+__QUEUE_POLICY     = cfgData['queuePolicy']   #order to evaluate waiting models: fifo, fair or sjf
+__QUEUE_MAX_WAIT   = cfgData['queueMaxWait']  #sjf: seconds waiting before a model goes first
+__EARLY_STOP       = cfgData['earlyStop']     #stop evaluation if model cannot beat its tag best score
+__PROVISIONAL      = cfgData['provisional']   #fraction of each class for a quick provisional score
+__PROGRESS_RATE    = cfgData['progressRate']  #max evaluation progress updates per second
+__PROGRESS_POINTS  = cfgData['progressPoints']#max evaluation progress chart points
+__EVAL_ISOLATE     = cfgData['evalIsolate']   #evaluate each model in a child process with limits
+__EVAL_TIMEOUT     = cfgData['evalTimeout']   #child wall clock seconds
+__EVAL_CPU_LIMIT   = cfgData['evalCpuLimit']  #child CPU seconds, 0 no limit
+__EVAL_MEM_LIMIT   = cfgData['evalMemoryLimit']*1024*1024  #child address space MiB, 0 no limit
+__EVAL_PYTHON      = cfgData['evalPython']    #python executable for the child, '' this one
+__KERAS_ENGINE     = cfgData['kerasEngine']   #Keras models inference engine: keras, xla or tflite
+__KERAS_THREADS    = cfgData['kerasThreads']  #TFLite interpreter threads, 0 all cores
+__KERAS_TOLERANCE  = cfgData['kerasTolerance']#max prediction difference of the engine to Keras
+__BATCH_TUNE       = cfgData['batchTune']     #choose the evaluation batch size of each model
+__BATCH_LADDER     = cfgData['batchLadder']   #batch sizes to probe
+__BATCH_PROBE      = cfgData['batchProbe']    #samples to time each batch size
+__BATCH_MEMORY     = cfgData['batchMemory']*1024*1024  #max batch inputs and layer outputs MiB, 0 no cap
 __EVAL_SHUFFLE     = cfgData['shuffle']     #Shuffle dataset before evaluation
 __EVAL_SEED        = cfgData['seed']        #Seed for shuffle dataset before evaluation
 if __EVAL_SEED == '':
     __EVAL_SEED = None                       #None shuffle differently every time
                                              #int  shuffle the same way every time
+__EVAL_PROG_SHM    = cfgData['evalProgShm']       #shared memory name for evaluation progress
+__EVAL_PROG_POINTS = cfgData['evalProgShmPoints'] #shared memory progress points
+__LOG_MAX_SIZE     = cfgData['logMaxSize']*1024*1024  #rotate log file at MiB, 0 never
+__LOG_BACKUPS      = cfgData['logBackups']  #rotated log files kept
+__LOG_JSON         = cfgData['logJson']     #JSON lines log
+__LOG_STAGES       = cfgData['logStages']   #log evaluation stage durations
+__GZIP_MIN_SIZE    = cfgData['gzipMinSize'] #smallest JSON response gzipped, 0 never
+__GZIP_LEVEL       = cfgData['gzipLevel']   #gzip level of JSON responses
+__STATIC_MAX_AGE   = cfgData['staticMaxAge']#browser cache seconds of fingerprinted static files
+__TRAIN_SENDFILE   = cfgData['trainSendfile']   #train dataset sent by the front end: x-sendfile, x-accel-redirect or ''
+__TRAIN_ACCEL      = cfgData['trainAccelPrefix']#nginx internal location of the data folder
 
 #Setup logging
 #disable message on develop server: http://127.0.0.1:5000/
 #Setup level=WARN to omit GET messages in log
-FlaskLog.setup(__LOG_FN, FlaskLog.WARN)  
+FlaskLog.setup(__LOG_FN, FlaskLog.WARN, __LOG_MAX_SIZE, __LOG_BACKUPS, __LOG_JSON, __LOG_STAGES)  
 FlaskLog.warning('DLChan web app started')
 
 #Load Model Chooser
@@ -87,40 +136,96 @@ modelSel:ModelSelect = ModelSelect(supportedModels)
 #to animate evaluation chart
 #https://py-filelock.readthedocs.io/en/latest/index.html
 multiThread = True     
+
+#With shared memory evaluation progress, several server processes may load this app:
+#only the first one to get the evaluator lock runs the evaluator,
+#the others just read the evaluation progress it publishes
+if __EVAL_PROG_SHM == '':
+    isEvaluator = True
+else:
+    evalLock = FileLock(__EVAL_LOCK_FN, thread_local=not multiThread)
+    try:
+        evalLock.acquire(timeout=0)     #held while this process lives
+        isEvaluator = True
+    except Timeout:
+        isEvaluator = False
+
+histLock    = FileLock  (__HIST_LOCK_FN, thread_local=not multiThread)
+evalHistory = EvalHist  (__EVAL_HIST_FN, histLock)
+
+curveLock   = FileLock  (__CURVE_LOCK_FN, thread_local=not multiThread)
+curveStore  = CurveStore(__CURVE_BLOB_FN, __CURVE_INDEX_FN, curveLock)
+
 queueLock   = FileLock(__QUEUE_LOCK_FN, thread_local=not multiThread)
-runQueue    = RunQueue(__RUN_QUEUE_FN, queueLock)
-runQueue.clear()
+queuePolicy = QueuePolicy.fromName(__QUEUE_POLICY, __UPLOAD_FOLDER, evalHistory, __QUEUE_MAX_WAIT)
+runQueue    = RunQueue(__RUN_QUEUE_FN, queueLock, __QUEUE_NOTIFY_FN, queuePolicy)
+if isEvaluator:
+    runQueue.clear()
+    runQueue.listen()   #models added by other server processes wake up the evaluator
 
+ScoreTable.setup(__TOP_HIST_POINTS)
 scoreLock   = FileLock  (__SCORE_LOCK_FN, thread_local=not multiThread)
 scoreTable  = ScoreTable(__SCORE_TABLE_FN, scoreLock)
 
-histLock    = FileLock  (__HIST_LOCK_FN, thread_local=not multiThread)
-evalHistory = EvalHist  (__EVAL_HIST_FN, histLock)
+#Additional evaluation datasets, each with its score table, loaded by the evaluator on first use
+evalSets = []
+for name, datasetFN in __EVAL_SETS.items():
+    #the name goes in lock, score table and URL names
+    if re.fullmatch(r'[A-Za-z0-9_-]+', name) is None:
+        raise ValueError(f'evalSets name "{name}": only letters, digits, - and _ are allowed')
+    setLock  = FileLock  (os.path.join(__TMP_FOLDER, f'dlscore-{name}.lock'), thread_local=not multiThread)
+    setTable = ScoreTable(os.path.join(__DATA_FOLDER, f'scoretable-{name}.pickle'), setLock)
+    evalSets.append(EvalSet(name, os.path.join(__DATA_FOLDER, datasetFN), setTable))
 
 #Shared evaluation progress data to pass info from evaluator thread to routes
-evalProg     = EvaluationProgess()  #tag, acc, progress(batch), score position, batches, blink
+if __EVAL_PROG_SHM == '':
+    evalProg = EvaluationProgess()  #tag, acc, progress(batch), score position, batches, blink
+else:
+    #the evaluator creates and removes it, the other processes only attach
+    evalProg = SharedEvaluationProgess(__EVAL_PROG_SHM, __EVAL_PROG_POINTS, owner=isEvaluator)
+    if isEvaluator:
+        evalProg.clear()
+        atexit.register(evalProg.close)
 
 
 #Evaluator
-eval = Evaluator(modelSel, runQueue, evalProg, scoreTable, scoreLock, evalHistory,
-                            __UPLOAD_FOLDER, __BEST_MODELS_FOLDER, __EVAL_DATASET_FN, 
-                            __CLASSES_DATASET, __CHANNELS_DATASET, __MAPS_DATASET,
-                            __EVAL_SHUFFLE, __EVAL_SEED)
-
-evalThread = Thread(target=eval.evaluatorThread, daemon=True, args=[__EVAL_PERIOD])
-evalThread.start()
+if isEvaluator:
+    EvalProgressUpdate.setup(__PROGRESS_RATE, __PROGRESS_POINTS)
+    ModelRkEvKeras.setup(__KERAS_ENGINE, __KERAS_THREADS, __KERAS_TOLERANCE)
+    watchdog = None
+    if __EVAL_ISOLATE:
+        watchdog = EvalWatchdog(modelSel, __EVAL_TIMEOUT, __EVAL_CPU_LIMIT, __EVAL_MEM_LIMIT,
+                                __EVAL_SHUFFLE, __EVAL_SEED, __EVAL_PYTHON)
+    tuner = None
+    if __BATCH_TUNE:
+        tuner = BatchTuner(__BATCH_LADDER, __BATCH_PROBE, __BATCH_MEMORY)
+    eval = Evaluator(modelSel, runQueue, evalProg, scoreTable, scoreLock, evalHistory,
+                                __UPLOAD_FOLDER, __BEST_MODELS_FOLDER, __EVAL_DATASET_FN, 
+                                __CLASSES_DATASET, __CHANNELS_DATASET, __MAPS_DATASET,
+                                __EVAL_SHUFFLE, __EVAL_SEED, __PREFETCH_BUDGET, __EARLY_STOP,
+                                __PROVISIONAL, watchdog, tuner, evalSets, curveStore)
+
+    evalThread = Thread(target=eval.evaluatorThread, daemon=True, args=[__EVAL_PERIOD, __BLINK_PERIOD])
+    evalThread.start()
+    FlaskLog.warning(f'evaluator started in process: {os.getpid()}')
+
+#Live data for polling routes, shared by WSGI views and ASGI app
+liveData = LiveData(evalProg, scoreTable, runQueue, __EVAL_DATASET, __CHALLENGE_END,
+                    JobEstimator(evalHistory), {s.name: s.scoreTable for s in evalSets})
 
 
 #Define app and routes
 app:Flask = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(20)
+StaticAssets.setup(app, __GZIP_MIN_SIZE, __GZIP_LEVEL, __STATIC_MAX_AGE)
 #app.config['APPLICATION_ROOT'] = '/dlchan'
 
 
 from views import Routes
 Routes.setup(app, modelSel, runQueue, evalProg, scoreTable, evalHistory,
              __HOME_PAGE_FN, __UPLOAD_FOLDER, __MAX_MODEL_SIZE,
-             __EVAL_DATASET, __TRAIN_DATASET_FN, __CHALLENGE_END)
+             __EVAL_DATASET, __TRAIN_DATASET_FN, __CHALLENGE_END, liveData, curveStore,
+             FileDownload(__TRAIN_SENDFILE, __TRAIN_ACCEL))
 
 #Note: No need to app.run() because launch.json is running the flask app from comand line
 #      Anyway, it is better this way to avoid conflicts when running with apache2 wsgi
@@ -0,0 +1,122 @@
+#Evaluation batch size autotuning for ML/DL run challenge
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import hashlib, time
+from typing import *
+from numpy.typing import NDArray
+from modules.mdlrankeval import ModelRankEval
+from modules.flasklog import FlaskLog
+from modules.metrics import Metrics
+
+
+class BatchTuner:
+    '''
+    Chooses the evaluation batch size of each model:
+    times predictions of a small slice of the dataset with each batch size of the ladder
+    and keeps the one with more samples per second, among the ones whose batch
+    (inputs and layer outputs) fits in memoryCap bytes, 0 no cap
+
+    The choice is cached by model file content and architecture, so a model
+    uploaded again is not probed again. Accuracy is a count of correct samples,
+    the same whatever the batch size
+
+    Probing runs the model: with an EvalWatchdog, probe() is called in the
+    evaluation child and only the cache is kept in the Evaluator process
+    '''
+
+    def __init__(self, ladder:List[int], probeSamples:int=256, memoryCap:int=0, default:int=32) -> None:
+        self._ladder  = sorted(ladder)
+        self._probe   = probeSamples
+        self._cap     = memoryCap
+        self._default = default
+        self._cache   : Dict[Tuple[str, str], Tuple[int, float]] = {}   # (hash, arch): (batch size, samples/s)
+
+
+    @staticmethod
+    def fileHash(modelFN:str) -> str:
+        h = hashlib.sha256()
+        with open(modelFN, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+
+    @staticmethod
+    def signature(model:ModelRankEval) -> str:
+        return f'{type(model).__name__}:{model.inputShape()}:{model.modelCountParams()}'
+
+
+    def fits(self, model:ModelRankEval, X:NDArray, batchSize:int) -> bool:
+        if self._cap <= 0:
+            return True
+        return batchSize * (X[0].nbytes + model.activationBytes()) <= self._cap
+
+
+    def key(self, model:ModelRankEval, modelFN:str) -> Optional[Tuple[str, str]]:
+        '''cache key of model, None if its file cannot be read'''
+        try:
+            return (self.fileHash(modelFN), self.signature(model))
+        except OSError:
+            return None
+
+
+    def cached(self, key:Optional[Tuple[str, str]]) -> Optional[int]:
+        '''batch size already chosen for key, None if not probed yet'''
+        if key not in self._cache:
+            return None
+        best, bestRate = self._cache[key]
+        Metrics.set('eval_batch_size', best)
+        Metrics.set('eval_probe_samples_per_second', bestRate)
+        return best
+
+
+    def probe(self, model:ModelRankEval, X:NDArray) -> Tuple[Optional[int], float]:
+        '''
+        (batch size, samples/s) of the fastest batch size on a slice of X, (None, 0) if none could be timed
+        runs the model, so it is called in the watchdog child when evaluations are isolated
+        '''
+        probe = X[:self._probe]
+        best, bestRate = None, 0.0
+        for batchSize in self._ladder:
+            if not self.fits(model, X, batchSize):
+                break       #ladder is sorted: larger sizes do not fit either
+            try:
+                model.predictBatches(probe[:batchSize], batchSize)   #warm up: graph tracing, caches
+                start = time.perf_counter()
+                model.predictBatches(probe, batchSize)
+                seconds = time.perf_counter() - start
+            except Exception as e:
+                FlaskLog.warning(f'batch size {batchSize} probe failed: {e}')
+                break
+            rate = probe.shape[0] / seconds if seconds > 0 else float('inf')
+            if rate > bestRate:
+                best, bestRate = batchSize, rate
+        return best, bestRate
+
+
+    def store(self, key:Optional[Tuple[str, str]], best:Optional[int], bestRate:float) -> int:
+        '''cache a probe result, returns the batch size to use: best, or default if none was probed'''
+        if best is None:
+            FlaskLog.warning(f'no batch size probed, using {self._default}')
+            return self._default
+
+        if key is not None:
+            self._cache[key] = (best, bestRate)
+        Metrics.set('eval_batch_size', best)
+        Metrics.set('eval_probe_samples_per_second', bestRate)
+        FlaskLog.warning(f'batch size {best} chosen, {bestRate:.0f} samples/s')
+        return best
+
+
+    def choose(self, model:ModelRankEval, modelFN:str, X:NDArray) -> int:
+        '''batch size to evaluate model on X in this process, default if no batch size could be timed'''
+        key  = self.key(model, modelFN)
+        best = self.cached(key)
+        if best is not None:
+            return best
+        with Metrics.span('batch_tune'):
+            best, bestRate = self.probe(model, X)
+        return self.store(key, best, bestRate)
@@ -0,0 +1,121 @@
+#Accuracy curves of all evaluations for ML/DL run challenge
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+from datetime import datetime
+import os
+import numpy as np
+from filelock import FileLock
+from typing import *
+
+
+class CurveStore:
+    '''
+    Append only store of the accuracy history by batch of every evaluation:
+        blobFN   float32 accuracies of all evaluations, one after the other
+        indexFN  one line by evaluation: tag, date, offset, count
+                 offset and count in float32 values of blobFN
+    The blob is written and synced before its index line, so an interrupted write
+    leaves unreferenced values, never a line without its curve, and a partial
+    value it left is cut before the next curve is appended.
+
+    Curves are read as slices of a memory map of the blob,
+    the index is parsed again only when it changes
+    '''
+
+    def __init__(self, blobFN:str, indexFN:str, lock:FileLock) -> None:
+        self._blobFN  = blobFN
+        self._indexFN = indexFN
+        self._lock    = lock
+        self._index   : Dict[str, List[Tuple[str, int, int]]] = {}   # tag: [(date, offset, count)]
+        self._indexStamp = None
+        self._blob    : Optional[np.memmap] = None
+
+
+    def add(self, tag:str, accHist:List[float]) -> None:
+        '''
+        Atomic append of an evaluation curve
+        '''
+        with self._lock:
+            self.__unlockedAdd(tag, accHist)
+
+
+    def __unlockedAdd(self, tag:str, accHist:List[float]) -> None:
+        values = np.asarray(accHist, dtype=np.float32)
+        with open(self._blobFN, 'ab') as f:
+            end = f.tell()
+            if end % values.itemsize != 0:
+                end -= end % values.itemsize
+                f.truncate(end)         #partial value of an interrupted write
+            offset = end // values.itemsize
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())        #the index line only refers to stored values
+
+        date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(self._indexFN, 'a') as f:
+            f.write(f'{tag}, {date}, {offset}, {len(values)}\n')
+
+
+    def runs(self, tag:str) -> List[str]:
+        '''dates of the stored evaluations of tag, oldest first'''
+        self.__parse()
+        return [run[0] for run in self._index.get(tag, [])]
+
+
+    def curve(self, tag:str, date:str=None) -> Optional[Tuple[str, np.ndarray]]:
+        '''
+        (date, accuracy by batch) of the last evaluation of tag, or of the one at date
+        None if not stored
+        '''
+        self.__parse()
+        runs = self._index.get(tag)
+        if not runs:
+            return None
+        if date is None:
+            run = runs[-1]
+        else:
+            run = next((r for r in reversed(runs) if r[0] == date), None)
+            if run is None:
+                return None
+
+        date, offset, count = run
+        blob = self.__map(offset + count)
+        if blob is None:
+            return None
+        return date, np.array(blob[offset:offset+count])
+
+
+    def __map(self, values:int) -> Optional[np.memmap]:
+        '''memory map of the blob with at least values, mapped again if it grew'''
+        if self._blob is None or len(self._blob) < values:
+            try:
+                self._blob = np.memmap(self._blobFN, dtype=np.float32, mode='r')
+            except (OSError, ValueError):     #missing or empty
+                return None
+        return self._blob if len(self._blob) >= values else None
+
+
+    def __parse(self) -> None:
+        '''parse index, again only if the file changed'''
+        try:
+            stamp = os.stat(self._indexFN).st_mtime_ns
+        except OSError:
+            return
+        if stamp == self._indexStamp:
+            return
+
+        with self._lock:
+            with open(self._indexFN, 'r') as f:
+                lines = f.read().splitlines()
+
+        index = {}
+        for line in lines:
+            cols = line.rsplit(', ', 3)     #tags may have ', '
+            try:
+                index.setdefault(cols[0], []).append((cols[1], int(cols[2]), int(cols[3])))
+            except (IndexError, ValueError):
+                pass
+        self._index, self._indexStamp = index, stamp
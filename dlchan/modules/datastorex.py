@@ -1,9 +1,10 @@
 # Dataset reader/writer and manipulation
 # version for ML/DL running challendge
-# 7 set 2022, hdaniel@ualg.pt 
+# 7 set 2022, oct 2026, hdaniel@ualg.pt 
 
 from scipy.io import loadmat
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np, os
 from numpy.typing import NDArray
 from typing import *
 import tensorflow as tf
@@ -19,7 +20,7 @@ class Datastore:
     #             labelsName:str='Y') -> Tuple[NDArray, NDArray]:
     @classmethod
     def read(cls, fname, featuresName:str='X', 
-                 labelsName:str='Y') -> Tuple[NDArray, NDArray]:
+                 labelsName:str='Y', workers:int=0) -> Tuple[NDArray, NDArray]:
         '''
         Reads a dataset stored as a file in Matlab *.mat format with:
         a MxN matrix with the features and
@@ -31,38 +32,48 @@ class Datastore:
 
         fname is a string with a filename or a List of strings with filenames.
         returns the feature and label as numpy arrays sorted by fault classes
+
+        One file is returned as read, not sorted.
+        Several files are read once each by workers threads (0: one by file, up to
+        the number of cores), all with the same number of features, then their
+        features are copied straight to their class sorted rows of one preallocated array
         '''
         if isinstance(fname, str):
             fname = [fname]
-
-        X=None
-        y=None
-        for f in fname:
-            ds=loadmat(f)
-            Xc = ds[featuresName] # X is expected to be float32
-            yc = ds[labelsName]   # Y is expected to be one hot encoded uint8
-            if X is None:
-                X = Xc
-                y = yc
-            else:
-                X = np.concatenate((X, Xc), axis=0)
-                y = np.concatenate((y, yc), axis=0)
-
-        #Sort by faults
-        if len(fname) > 1:
-            #Get class number from one_hot
-            classNumbers = np.argmax(y, axis=1)
-            #get class number sorted indexes
-            idxs = np.argsort(classNumbers)
-            #Sort by indexes
-            X = X[idxs]
-            y = y[idxs]
+        if len(fname) == 1:
+            ds = loadmat(fname[0])
+            return ds[featuresName], ds[labelsName]     # X is expected to be float32
+        if workers <= 0:
+            workers = min(len(fname), os.cpu_count() or 1)
+
+        with ThreadPoolExecutor(workers) as pool:
+            parts = list(pool.map(lambda f: loadmat(f, variable_names=[featuresName, labelsName]), fname))
+            points = parts[0][featuresName].shape[1]
+            for f, ds in zip(fname, parts):
+                if ds[featuresName].ndim != 2 or ds[featuresName].shape[1] != points:
+                    raise ValueError(f'{featuresName} in {f} is {ds[featuresName].shape}, '
+                                     f'expected {points} features as in {fname[0]}')
+
+            #Sort by faults: destination row of each sample, stable sort by class
+            y = np.concatenate([ds[labelsName] for ds in parts], axis=0)
+            order = np.argsort(np.argmax(y, axis=1), kind='stable')
+            dest  = np.empty_like(order)
+            dest[order] = np.arange(len(order))
+            y = y[order]
+
+            X = np.empty((y.shape[0], points), dtype=np.result_type(*[ds[featuresName] for ds in parts]))
+            starts = np.cumsum([0] + [ds[labelsName].shape[0] for ds in parts])
+
+            def fill(i:int) -> None:
+                X[dest[starts[i]:starts[i+1]]] = parts[i][featuresName]   # X is expected to be float32
+                parts[i] = None     #free the file copy
+            list(pool.map(fill, range(len(fname))))
 
         return X, y
 
 
     #Shuffle and split dataset 
-    #making sure each class have same number of samples
+    #each class split with the same train proportion
     #for trainning and testing
     @classmethod
     def split(cls, X:NDArray, y:NDArray, numClasses:int, split:float, 
@@ -70,74 +81,67 @@ class Datastore:
         '''
         Shuffle and split dataset defined in X and y:
         X is MxN matrix with the features and
-        y is Mx1 matrix with the labels
+        y is Mxp matrix with the labels, one hot encoded (or Mx1 with the class number)
 
         M is the number of samples
         N is the number of features (or data points) in each sample 
 
-        It is assumed that the samples with the labels are ordered and not mixed:
-        First are all the samples with the first label
-        then are all the samples with the second label
-        (...)
+        The samples of each class are shuffled, classes may have different sizes,
+        and each class is split:
 
-        Each set of of class labes are shuffled in place, keeping the order above
+        Train samples = Class samples * split 
+        Test samples  = Class samples - Train samples
 
-        The data set is then split:
+        X and y are not changed: one permutation of all rows, shuffled inside classes,
+        is gathered once into each output, cast only if X, y types differ from xType, yType
 
-        Train samples = Samples * split 
-        Test samples  = Samples - TrainSamples
+        The shuffle sorts one np.random.random() key by sample, it draws other numbers
+        than the previous permutation by class: a split seeded with np.random.seed
+        is not the one of previous versions
 
-        returns the feature and label train and test sets as numpy arrays:
+        returns the feature and label train and test sets as numpy arrays,
+        samples ordered by class:
 
         xTrain, yTrain, xTest, yTest 
         '''
-        #Separate datasets equally by fault classes
-        sinalLength  = int(X.shape[1])
-        samplesClass = int(X.shape[0] / numClasses)
-        splitPoint   = int(samplesClass*split)
-        
-        xTrain = []
-        yTrain = []
-        xTest  = []
-        yTest  = []
-
-        for i in range(numClasses):       
-            #slice by fault class
-            st = i*samplesClass
-            sp = st + splitPoint
-            end = (i+1)*samplesClass
-            
-            #shuffle in place each fault data before slice train/set
-            p = np.random.permutation(samplesClass)
-            X[st:end, :] = X[st+p, :]
-            y[st:end, :] = y[st+p, :]
-                
-            xTrain.append(X[st:sp, :])
-            yTrain.append(y[st:sp, :])
-            xTest.append (X[sp:end, :])
-            yTest.append (y[sp:end, :])
-
-        #Reshape matrices to proper sizes and define data types
-        xTrain = np.array(xTrain, dtype=xType)
-        yTrain = np.array(yTrain, dtype=yType)
-        xTest  = np.array(xTest,  dtype=xType)
-        yTest  = np.array(yTest,  dtype=yType)
-        xTrain = xTrain.reshape(numClasses*splitPoint, sinalLength)
-        yTrain = yTrain.reshape(numClasses*splitPoint, numClasses)
-        xTest  = xTest.reshape (numClasses*(samplesClass-splitPoint), sinalLength)
-        yTest  = yTest.reshape (numClasses*(samplesClass-splitPoint), numClasses)
-    
-        #Samples are shuflled inside class
-        #but classes are in order
-        #Need to shuffle in fit (model.fit(shuffle=True))
-        #which is better since it shuffle before each epoch
+        classNumbers = np.argmax(y, axis=1) if y.shape[1] > 1 else y[:, 0].astype(np.intp)
+        counts = np.bincount(classNumbers, minlength=numClasses)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        splitPoints = (counts*split).astype(np.intp)      #train samples by class
+
+        #rows by class, random order inside each class: sort random keys by class
+        order = np.lexsort((np.random.random(X.shape[0]), classNumbers))
+
+        #position of each row inside its class, train if before the class split point
+        sortedClass = classNumbers[order]
+        position    = np.arange(X.shape[0]) - starts[sortedClass]
+        isTrain     = position < splitPoints[sortedClass]
+        trainIdx    = order[isTrain]
+        testIdx     = order[~isTrain]
 
-        return xTrain, yTrain, xTest, yTest 
+        return (cls._gather(X, trainIdx, xType), cls._gather(y, trainIdx, yType),
+                cls._gather(X, testIdx,  xType), cls._gather(y, testIdx,  yType))
 
 
+    _gatherRows = 4096      # rows cast at a time by _gather
 
-    #Read and shuffle dataset 
-    #making sure each class have same number of samples
+    @classmethod
+    def _gather(cls, A:NDArray, idx:NDArray, dtype:str) -> NDArray:
+        '''
+        rows idx of A with type dtype, written once to the output:
+        cast by blocks of rows if A has another type, so only a block is copied twice
+        '''
+        out = np.empty((len(idx),) + A.shape[1:], dtype=dtype)
+        if A.dtype == out.dtype:
+            return np.take(A, idx, axis=0, out=out, mode='clip')  #indexes are valid: clip skips buffering
+        for start in range(0, len(idx), cls._gatherRows):
+            out[start:start+cls._gatherRows] = A[idx[start:start+cls._gatherRows]]
+        return out
+
+
+
+    #Read, shuffle and split dataset 
+    #each class split with the same train proportion
     #for trainning and testing
     @classmethod
     def readSplit(cls, fname:str, numClasses:int, trainPer:float, 
@@ -151,17 +155,13 @@ class Datastore:
         M is the number of samples
         N is the number of features (or data points) in each sample 
 
-        It is assumed that the samples with the labels are ordered and not mixed:
-        First are all the samples with the first label
-        then are all the samples with the second label
-        (...)
-
-        Each set of of class labes are shuffled in place, keeping the order above
+        The samples of each class are shuffled, see split(), the arrays read
+        are not changed, and each class is split:
 
-        The data set is then split:
+        Train samples = Class samples * trainPer 
+        Test samples  = Class samples - Train samples
 
-        Train samples = Samples * trianPer 
-        Test samples  = Samples - TrainSamples
+        returned samples are ordered by class
 
         returns the feature and label train and test sets as numpy arrays:
 
@@ -86,6 +86,43 @@ class Model(ABC):
     def modelCountParams(self) -> Tuple:
         pass 
 
+    def costEstimate(self) -> Optional[float]:
+        '''
+        Static inference cost of one sample, in multiply-accumulates or equivalent
+        operations, computed from the model structure without running it.
+        None if unknown, subclasses should override it
+        '''
+        return None
+
+    def costPerInput(self) -> Optional[float]:
+        '''
+        costEstimate() by input value.
+        The evaluation dataset has a fixed number of values, split in samples of the
+        model input size, so the evaluation time grows with this cost, not the sample one
+        '''
+        cost  = self.costEstimate()
+        shape = self.inputShape()
+        if cost is None or shape is None:
+            return None
+        values = 1
+        for d in shape:
+            values *= d if d else 1
+        return cost / values
+
+    def costFamily(self) -> str:
+        '''
+        Kind of model whose costEstimate() units are comparable, so evaluation
+        seconds per cost unit can be learned by family. Default the file extension
+        '''
+        return self.fileExtension()
+
+    def activationBytes(self) -> int:
+        '''
+        Memory of the intermediate values to predict one sample, besides the sample itself
+        0 if unknown, subclasses should override it
+        '''
+        return 0
+
     @abstractmethod
     def __str__(self) -> Tuple:
         pass 
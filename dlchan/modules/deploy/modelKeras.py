@@ -79,6 +79,75 @@ class ModelKeras(Model):
 
     def modelCountParams(self) -> Tuple:
         return self._model.count_params()
+
+    def costEstimate(self) -> Optional[float]:
+        '''multiply-accumulates of one sample, summed by layer'''
+        try:
+            return float(self._modelMacs(self._model))
+        except Exception:
+            return None
+
+    def activationBytes(self) -> int:
+        '''float32 layer outputs of one sample'''
+        total = 0
+        for layer in self._model.layers:
+            try:
+                total += int(np.prod([d if d else 1 for d in layer.output.shape[1:]])) * 4
+            except Exception:
+                pass    #shared layer, several outputs
+        return total
+
+    @classmethod
+    def _modelMacs(cls, model:keras.Model) -> int:
+        macs = 0
+        for layer in model.layers:
+            if isinstance(layer, keras.Model):      #nested models
+                macs += cls._modelMacs(layer)
+            else:
+                try:
+                    macs += cls._layerMacs(layer)
+                except Exception:
+                    macs += layer.count_params()    #shared or unbuilt layer: as a dense layer
+        return macs
+
+    @classmethod
+    def _layerMacs(cls, layer:keras.layers.Layer) -> int:
+        '''
+        From layer config and input/output shapes, without batch size:
+            Dense:          output values * input features
+            Conv:           output values * kernel size * input channels / groups
+            Transposed conv:input values  * kernel size * filters
+            Depthwise conv: output values * kernel size
+            Separable conv: depthwise + output values * input channels * depth multiplier
+            Recurrent:      timesteps * (kernel + recurrent kernel) sizes, by direction
+            Others:         output values (activations, pooling, normalization)
+        '''
+        size    = lambda shape: int(np.prod([d if d else 1 for d in shape]))
+        inShape = tuple(layer.input.shape[1:])
+        out     = size(layer.output.shape[1:])
+        kind    = type(layer).__name__
+
+        if kind in ('Dense', 'EinsumDense'):
+            return out * (inShape[-1] or 1)
+        if kind.startswith('SeparableConv'):
+            depthwise = size(layer.depthwise_kernel.shape)
+            return out // layer.filters * depthwise + out * size(layer.pointwise_kernel.shape[:-1])
+        if kind.startswith('DepthwiseConv'):
+            return out * size(layer.kernel.shape[:-2])
+        if kind.startswith('Conv') and kind.endswith('Transpose'):
+            return size(inShape) * size(layer.kernel.shape[:-1])
+        if kind.startswith('Conv'):
+            return out * size(layer.kernel.shape[:-1])
+        if kind == 'Bidirectional':
+            return sum(cls._rnnMacs(l, inShape) for l in (layer.forward_layer, layer.backward_layer))
+        if hasattr(layer, 'cell'):
+            return cls._rnnMacs(layer, inShape)
+        return out
+
+    @classmethod
+    def _rnnMacs(cls, layer:keras.layers.Layer, inShape:Tuple) -> int:
+        timesteps = inShape[0] or 1
+        return timesteps * sum(int(np.prod(w.shape)) for w in layer.cell.weights if len(w.shape) == 2)
     
     def valid(self, fn:str)->bool:
         '''
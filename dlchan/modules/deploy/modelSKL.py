@@ -6,6 +6,7 @@
 #
 
 import pickle
+import numpy as np
 from typing import *
 from numpy.typing import NDArray
 from model import Model
@@ -72,6 +73,46 @@ class ModelSKL(Model):
         return f
     
 
+    def costEstimate(self) -> Optional[float]:
+        '''
+        Operations to predict one sample, by model family:
+            tree ensembles: sum of tree depths
+            trees:          depth
+            neighbors:      training samples * features (brute force distances)
+            SVM:            support vectors * features
+            linear, MLP:    parameters
+        '''
+        model    = self._model
+        features = self.inputShape()[0] or 1
+        try:
+            if hasattr(model, 'estimators_'):
+                cost = 0
+                for est in np.ravel(model.estimators_):
+                    sub  = ModelSKL(mdl=est).costEstimate()
+                    cost += sub if sub is not None else features
+                return float(cost)
+            if hasattr(model, 'tree_'):
+                return float(model.tree_.max_depth)
+            if hasattr(model, 'n_samples_fit_'):
+                return float(model.n_samples_fit_ * features)
+            if hasattr(model, 'support_vectors_'):
+                return float(model.support_vectors_.size)
+            params = self.modelCountParams()
+            return float(params if params is not None else features)
+        except Exception:
+            return None
+
+
+    def costFamily(self) -> str:
+        '''one by costEstimate() branch: each counts different operations'''
+        model = self._model
+        if hasattr(model, 'estimators_'):       return 'skl-ensemble'
+        if hasattr(model, 'tree_'):             return 'skl-tree'
+        if hasattr(model, 'n_samples_fit_'):    return 'skl-neighbors'
+        if hasattr(model, 'support_vectors_'):  return 'skl-svm'
+        return 'skl-params'
+
+
     def valid(self, fn:str)->bool:
         '''
         Try to load a SKLearn model file and and train it
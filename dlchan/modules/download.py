@@ -0,0 +1,145 @@
+#Large file downloads for ML/DL run challenge web app
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import gzip, hashlib, os, pickle, shutil, threading
+import numpy as np
+from typing import *
+from flask import Response, request, send_file
+
+
+class FileDownload:
+    '''
+    Training dataset download:
+        strong ETag from the file content: read from the f.etag file written by
+        buildTrainset.py, or hashed once by file version, at startup by warm(),
+        Range requests (resume) and If-None-Match / If-Range handled by send_file,
+        or the transfer passed to the front end server, so no server thread
+        is held while it sends the file:
+            sendfile = 'x-sendfile'        Apache mod_xsendfile, lighttpd
+                       'x-accel-redirect'  nginx, the file is served from accelPrefix + name
+                       ''                  sent by this app
+    Variants of the pickle file, written by buildTrainset.py:
+        gz   the pickle gzipped
+        npz  compressed numpy arrays X and Y, read with np.load
+    '''
+
+    variants = {'pickle': '', 'gz': '.gz', 'npz': '.npz'}   # format: suffix added to the pickle file name
+
+    def __init__(self, sendfile:str='', accelPrefix:str='') -> None:
+        if sendfile not in ('', 'x-sendfile', 'x-accel-redirect'):
+            raise ValueError(f'unknown sendfile mode: {sendfile}')
+        self._sendfile    = sendfile
+        self._accelPrefix = accelPrefix
+        self._etags       : Dict[str, Tuple[Tuple[int, int], str]] = {}   # file: ((mtime, size), etag)
+        self._etagLock    = threading.Lock()      # one request thread hashes a changed file, the others wait
+
+
+    @classmethod
+    def variant(cls, fn:str, fmt:str) -> Optional[str]:
+        '''file name of format fmt of fn, None if unknown format or not built'''
+        if fmt not in cls.variants:
+            return None
+        variantFN = fn + cls.variants[fmt]
+        return variantFN if os.path.isfile(variantFN) else None
+
+
+    @classmethod
+    def available(cls, fn:str) -> List[str]:
+        return [fmt for fmt in cls.variants if cls.variant(fn, fmt) is not None]
+
+
+    @staticmethod
+    def hashFile(fn:str) -> str:
+        h = hashlib.sha256()
+        with open(fn, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()[:32]
+
+
+    @staticmethod
+    def etagFN(fn:str) -> str:
+        return fn + '.etag'
+
+
+    @classmethod
+    def writeEtag(cls, fn:str) -> str:
+        '''write the ETag of fn in its .etag file, returns it'''
+        etag = cls.hashFile(fn)
+        with open(cls.etagFN(fn), 'w') as f:
+            f.write(etag)
+        return etag
+
+
+    def etag(self, fn:str) -> str:
+        '''
+        ETag of fn: from its .etag file if not older than fn, else sha256 of the content,
+        found again only if fn mtime or size changed
+        '''
+        st  = os.stat(fn)
+        ver = (st.st_mtime_ns, st.st_size)
+        with self._etagLock:
+            cached = self._etags.get(fn)
+            if cached is None or cached[0] != ver:
+                try:
+                    if os.stat(self.etagFN(fn)).st_mtime_ns < st.st_mtime_ns:
+                        raise OSError('stale etag file')
+                    with open(self.etagFN(fn), 'r') as f:
+                        etag = f.read().strip()
+                except OSError:
+                    etag = ''
+                cached = self._etags[fn] = (ver, etag if etag != '' else self.hashFile(fn))
+        return cached[1]
+
+
+    def warm(self, fn:str) -> None:
+        '''ETags of the built variants of fn, at startup instead of in the first requests'''
+        for fmt in self.available(fn):
+            self.etag(self.variant(fn, fmt))
+
+
+    def send(self, fn:str) -> Response:
+        etag = self.etag(fn)
+        if self._sendfile == '':
+            #conditional: 304 on If-None-Match, 206 on Range
+            response = send_file(fn, etag=etag, conditional=True, download_name=os.path.basename(fn))
+            response.headers['Accept-Ranges'] = 'bytes'
+            return response
+
+        #front end server sends the file and handles ranges, this app only validates
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(mimetype='application/octet-stream')
+            if self._sendfile == 'x-sendfile':
+                response.headers['X-Sendfile'] = fn
+            else:
+                response.headers['X-Accel-Redirect'] = self._accelPrefix + os.path.basename(fn)
+        response.set_etag(etag)
+        response.headers['Content-Disposition'] = f'inline; filename="{os.path.basename(fn)}"'
+        return response
+
+
+    @classmethod
+    def build(cls, fn:str) -> List[Tuple[str, int]]:
+        '''write the gz and npz variants of pickle file fn and the .etag files, returns [(file, size)]'''
+        gzFN = fn + cls.variants['gz']
+        with open(fn, 'rb') as src, gzip.open(gzFN, 'wb', compresslevel=9) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+        #X, Y dict as the pickle, or X then y
+        with open(fn, 'rb') as f:
+            data = pickle.load(f)
+            if not isinstance(data, dict):
+                data = {'X': data, 'Y': pickle.load(f)}
+        npzFN = fn + cls.variants['npz']
+        with open(npzFN, 'wb') as f:        #file object: np.savez adds .npz to names
+            np.savez_compressed(f, X=data['X'], Y=data['Y'])
+
+        #after the variants: an .etag file older than its file is not used
+        for v in (fn, gzFN, npzFN):
+            cls.writeEtag(v)
+        return [(v, os.path.getsize(v)) for v in (gzFN, npzFN)]
@@ -0,0 +1,56 @@
+#Early stop of evaluation for ML/DL run challenge
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+from typing import *
+
+
+class EvalBound:
+    '''
+    Exact upper bound of the final accuracy during evaluation:
+    with correct samples out of seen, the final accuracy is at most
+        (correct + samples - seen) / samples
+    that is, every remaining sample right.
+
+    ScoreTable.update only accepts a model with accuracy above its tag best,
+    or equal with fewer params. If the bound is below the tag best by at least
+    one sample, the model cannot be accepted, whatever the remaining samples,
+    and the evaluation can stop.
+    '''
+
+    def __init__(self, samples:int, batchSize:int, bestAcc:Optional[float]) -> None:
+        '''bestAcc: tag best accuracy in the score table, in percentage, None if tag not ranked'''
+        self._samples   = samples
+        self._batchSize = batchSize
+        self._best      = bestAcc
+        self.seen       = 0
+        self.stopped    = False
+        self.maxAcc     = 1.0     # bound when stopped, fraction [0-1]
+
+
+    def setBatchSize(self, batchSize:int) -> None:
+        '''batch size chosen after the bound was created, before the evaluation starts'''
+        self._batchSize = batchSize
+
+
+    def update(self, curAcc:float, curBatch:int) -> bool:
+        '''
+        curAcc is the accuracy of the samples evaluated up to batch curBatch (0 based)
+        returns True if the evaluation can stop
+        '''
+        self.seen = min((curBatch+1)*self._batchSize, self._samples)
+        if self._best is None or self.stopped:
+            return self.stopped
+
+        #counts are integers, curAcc is a float32 mean: round it back to a count
+        correct     = round(curAcc * self.seen)
+        maxCorrect  = correct + self._samples - self.seen
+        bestCorrect = self._best / 100 * self._samples
+
+        #half a sample of margin: stop only if short of the best by a whole sample
+        if maxCorrect < bestCorrect - 0.5:
+            self.stopped = True
+            self.maxAcc  = maxCorrect / self._samples
+        return self.stopped
@@ -1,6 +1,6 @@
 #Evaluation history for ML/DL run challenge
 #
-#0.1 Nov 2024
+#0.1 Nov 2024, 0.2 oct 2026
 #hdaniel@ualg.pt
 #
 
@@ -11,26 +11,61 @@ from typing import *
 
 
 class EvalHist:
+    '''
+    Evaluation history, one line by evaluation:
+        status, tag, acc, loss, params, date[, seconds[, cost, kind, size[, set]]]
+    cost is the model static cost by input value (Model.costPerInput)
+    and kind its cost family (Model.costFamily), rates are learned by kind
+    size the model file bytes, 0 or '' if unknown
+    set is the name of the additional dataset (EvalSet) of the line,
+    lines without it are evaluations of the main dataset
+    status is 1 if the score table was updated, 0 if not,
+    or one of the codes below if the evaluation did not finish
+    '''
+    STOPPED = 'S'   # stopped early, could not improve: acc is its upper bound
+    TIMEOUT = 'T'   # killed by the evaluation watchdog after its timeout
+    KILLED  = 'K'   # evaluation process died: CPU or memory limits, crash
 
     def __init__(self, histFN:str, lock:FileLock) -> None:
         self._histFN = histFN
         self._lock = lock
+        self._durations : Dict[str, List[float]] = {}   # tag: seconds
+        self._rates     : Dict[str, List[float]] = {}   # kind: seconds per cost unit
+        self._byteRates : List[float] = []              # seconds per model file byte
+        self._parsedStamp = None
         
         
-    def add(self, tag:str, acc:float, loss:float, param:int, best:bool) -> None:
+    def add(self, tag:str, acc:float, loss:float, param:int, best:bool, seconds:float=None,
+                  status:str=None, cost:float=None, kind:str=None, evalSet:str=None,
+                  size:int=None) -> None:
         '''
         Atomic append to file
+        seconds is the job duration, appended if known: main evaluation and additional datasets,
+        whose lines have their own seconds,
+        followed by the model cost, kind and file size, if any is known
+        status replaces best in the first column if given
+        evalSet is appended for additional datasets, with all the previous columns
         '''
         with self._lock:
-            self.__unlockedAdd(tag, acc, loss, param, best)
+            self.__unlockedAdd(tag, acc, loss, param, best, seconds, status, cost, kind, evalSet, size)
 
 
-    def __unlockedAdd(self, tag:str, acc:float, loss:float, param:int, best:bool) -> bool:
+    def __unlockedAdd(self, tag:str, acc:float, loss:float, param:int, best:bool, seconds:float,
+                            status:str, cost:float, kind:str, evalSet:str, size:int) -> bool:
         
         #add new entry or update if it exists
         #Convert acc to percentage
         u = '1' if best else '0'
-        entry = u +', '+ tag +', '+ str(acc*100) +', '+ str(loss) +', '+ str(param) +', '+ datetime.now().strftime('%Y-%m-%d %H:%M:%S') +'\n'
+        if status is not None:
+            u = status
+        entry = u +', '+ tag +', '+ str(acc*100) +', '+ str(loss) +', '+ str(param) +', '+ datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if evalSet is not None:     #all columns, 0 cost and size if unknown
+            entry += ', {:.3f}, {:.6g}, {}, {}, {}'.format(seconds or 0, cost or 0, kind or '', size or 0, evalSet)
+        elif seconds is not None:
+            entry += ', {:.3f}'.format(seconds)
+            if cost is not None or kind is not None or size is not None:
+                entry += ', {:.6g}, {}, {}'.format(cost or 0, kind or '', size or 0)
+        entry += '\n'
          
         with open(self._histFN, 'a') as f:
             f.write(entry)
@@ -49,6 +84,65 @@ class EvalHist:
         with open(self._histFN, 'r') as f:
             return f.read()
 
+
+    def durations(self) -> Dict[str, List[float]]:
+        '''
+        Evaluation durations in seconds by tag, of the main dataset:
+        lines written before durations were registered and additional datasets lines are skipped
+        '''
+        self.__parse()
+        return self._durations
+
+
+    def rates(self) -> Dict[str, List[float]]:
+        '''
+        Evaluation seconds per model cost unit, by model kind (Model.costFamily)
+        lines without cost are skipped
+        '''
+        self.__parse()
+        return self._rates
+
+
+    def secondsPerByte(self) -> List[float]:
+        '''
+        Evaluation seconds per model file byte, of the main dataset
+        lines without file size are skipped
+        '''
+        self.__parse()
+        return self._byteRates
+
+
+    def __parse(self) -> None:
+        '''parse durations and rates, again only if the file changed'''
+        try:
+            stamp = os.stat(self._histFN).st_mtime_ns
+        except OSError:
+            return
+        if stamp == self._parsedStamp:
+            return
+
+        durations, rates, byteRates = {}, {}, []
+        for line in self.read().splitlines():
+            cols = line.split(', ')
+            if len(cols) >= 11:
+                continue    #additional dataset: not in queue estimates
+            try:
+                size = float(cols[9]) if len(cols) >= 10 else 0
+            except ValueError:
+                continue    #additional dataset written before the size column
+            try:
+                if len(cols) >= 7:
+                    seconds = float(cols[6])
+                    durations.setdefault(cols[1], []).append(seconds)
+                if len(cols) >= 9 and float(cols[7]) > 0 and cols[8] != '':
+                    rates.setdefault(cols[8], []).append(seconds / float(cols[7]))
+                if size > 0:
+                    byteRates.append(seconds / size)
+            except ValueError:
+                pass
+        self._durations, self._rates, self._byteRates = durations, rates, byteRates
+        self._parsedStamp = stamp
+
 #Test it
 if __name__ == '__main__':
     fn = 'evalhist.txt'
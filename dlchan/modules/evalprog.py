@@ -1,97 +1,134 @@
 # Used to pass values from Evaluator to routes during evaluation
 # ML/DL run challenge
 #
-#v0.1 jul 2022, v0.2 nov 2024
+#v0.1 jul 2022, v0.2 nov 2024, v0.3 oct 2026
 #hdaniel@ualg.pt
 #
 
 from typing import *
-import threading
+import threading, time
+
+
+class EvalSnapshot(NamedTuple):
+    '''
+    Immutable view of the evaluation progress, published by the Evaluator
+    '''
+    tag      : str = ''
+    acc      : List[Tuple[float, float]] = []   # append only list, shared between snapshots
+    accLen   : int = 0                          # number of acc items in this snapshot
+    pos      : int = -1                         # current position in the score table
+    batch    : Tuple[int, int] = (0,0)          # current processed batch
+    complete : bool = False                     # evaluation process completed
+                                                # all batches processed
+                                                # no more updates on this object
+                                                # until the evaluatio of a new model
+    topHist  : List[float] = []
+    highlight      : int   = -1                 # score table position to blink, kept across evaluations
+    highlightUntil : float = 0.0                # until this time.time()
+    provAcc  : float = -1.0                     # provisional accuracy (%) from a subsample, -1 none
+    provPos  : int   = -1                       # provisional position in the score table
+
+    def evalAcc(self) -> List[Tuple[float, float]]:
+        '''(x=batch, y=acc) list, copy of the items published in this snapshot'''
+        return self.acc[:self.accLen]
+
+    def highlighted(self) -> int:
+        '''score table position to blink or -1'''
+        if self.highlight > 0 and time.time() < self.highlightUntil:
+            return self.highlight
+        return -1
 
 
 class EvaluationProgess:
     '''
     To pass values to from Evaluator to routes during evaluation
+
+    Writers build a new EvalSnapshot and publish it with a single reference swap,
+    readers load the current snapshot without locking and never block the Evaluator
     '''
-    def __init__(self, tag:str='', evalAcc:List[Tuple[float, float]]=[], pos:int=-1, 
+    def __init__(self, tag:str='', evalAcc:List[Tuple[float, float]]=[], pos:int=-1,
                        batch:Tuple[int, int]=(0,0),
                        complete:bool=False, hist:List[float]=[]) -> None:
-        
-        self._lock = threading.Lock()
+
+        self._lock = threading.Lock()   # serializes writers only
         self.__update(tag, evalAcc, pos, batch, complete, hist)
-                    
+
     ############################
     #      general update      #
     ############################
-    def __update(self, tag:str='', evalAcc:List[Tuple[float, float]]=[], pos:int=-1, 
+    def __update(self, tag:str='', evalAcc:List[Tuple[float, float]]=[], pos:int=-1,
                       batch:Tuple[int, int]=(0,0),
                       complete:bool=False, hist:List[float]=[]) -> None:
+        #copy lists: add() appends to acc, it must never be a shared default argument
+        acc = list(evalAcc)
         with self._lock:
-            self.__tag      : str = tag
-            self.__evalAcc  : List[Tuple[float, float]] = evalAcc # (x=batch, y=acc)
-            
-            self.__pos      : int = pos       # current position in the score table
-            self.__batch    : Tuple[int, int] = batch     # current processed batch
-            self.__complete : bool= complete  # evaluation process completed
-                                            # all batches processed 
-                                            # no more updates on this object
-                                            # until the evaluatio of a new model
-            self.__topHist : List[float]=hist
+            #blink of the previous evaluation goes on while the next one runs
+            old = getattr(self, '_snap', EvalSnapshot())
+            self._snap = EvalSnapshot(tag, acc, len(acc), pos, batch, complete, list(hist),
+                                      old.highlight, old.highlightUntil)
 
 
     ############################
     #      Write functions     #
     ############################
     def clear(self) -> None:
-        #todo: needed to explicitly set clear arguments
-        #the default values are not being passed to the evalAcc if omitted
-        #it keeps the previous values. WHY??
         self.__update('', [], -1, (0,0), False, [])
+        self.setHighlight(-1, 0)
 
 
     def new(self, modeltag) -> None:
-        #todo: needed to explicitly set clear arguments
-        #the default values are not being passed to the evalAcc if omitted
-        #it keep the previous values. WHY??
         self.__update(modeltag, [], -1, (0,0), False, [])
 
 
-    def add(self, evalAcc:List[Tuple[float, float]]=None, pos:int=None, 
+    def add(self, evalAcc:List[Tuple[float, float]]=None, pos:int=None,
                   batch:Tuple[int, int]=()) -> None:
         with self._lock:
-            self.__evalAcc.append(evalAcc)
-            self.__batch = batch
-            self.__pos = pos
+            snap = self._snap
+            #published snapshots only see their first accLen items
+            snap.acc.append(evalAcc)
+            self._snap = snap._replace(accLen=snap.accLen+1, batch=batch, pos=pos)
 
 
     def setComplete(self, c:bool) -> None:
         with self._lock:
-            self.__complete = c
+            self._snap = self._snap._replace(complete=c)
 
     def setPosition(self, pos:int) -> int:
         with self._lock:
-            self.__pos = pos
-    
+            self._snap = self._snap._replace(pos=pos)
+
+    def setHighlight(self, pos:int, seconds:float) -> None:
+        '''blink score table position for some seconds, a UI only timer'''
+        with self._lock:
+            self._snap = self._snap._replace(highlight=pos, highlightUntil=time.time()+seconds)
+
+    def setProvisional(self, acc:float, pos:int) -> None:
+        '''accuracy (%) and position from a subsample, shown until the full run has results'''
+        with self._lock:
+            self._snap = self._snap._replace(provAcc=acc, provPos=pos)
+
 
     ############################
-    #      Write functions     #
+    #      Read functions      #
     ############################
+    def snapshot(self) -> EvalSnapshot:
+        '''consistent view of all values with a single attribute load'''
+        return self._snap
+
     def position(self) -> int:
-        with self._lock:
-            return self.__pos
-    
+        return self._snap.pos
+
     def complete(self) -> bool:
-        with self._lock:
-            return self.__complete 
-    
+        return self._snap.complete
+
     def tag(self) -> bool:
-        with self._lock:    
-            return self.__tag
+        return self._snap.tag
 
     def evalAcc(self) -> List[Tuple[float, float]]:
-        with self._lock:
-            return self.__evalAcc
-    
+        return self._snap.evalAcc()
+
     def batch(self) -> Tuple[int, int]:
-        with self._lock:
-            return self.__batch
+        return self._snap.batch
+
+    def highlighted(self) -> int:
+        return self._snap.highlighted()
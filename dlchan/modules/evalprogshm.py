@@ -0,0 +1,248 @@
+# Evaluation progress shared between processes
+# ML/DL run challenge
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+from typing import *
+from multiprocessing import shared_memory, resource_tracker
+import os, struct, threading, time
+from modules.evalprog import EvalSnapshot
+
+
+class SharedEvaluationProgess:
+    '''
+    Same interface as EvaluationProgess, stored in a fixed layout shared memory block,
+    so all web server processes see the progress of the evaluator process.
+
+    Layout:
+        header: seq, highlightUntil, provAcc, pos, curBatch, batches, highlight, provPos,
+                count, complete, capacity, generation, tag
+        ring buffer of capacity (progress, acc) float64 points, point i in slot i % capacity
+
+    generation is random, set by the owner when it creates the block. A restarted evaluator
+    creates a new block with the same name, readers still mapping the old one check the
+    name every recheck seconds and map the new block if its generation differs.
+
+    Only one process (the evaluator) writes. Readers do not lock, they use a seqlock:
+    the writer makes seq odd before changing data and even after, a reader retries
+    if seq was odd or changed while it copied the data.
+    '''
+
+    _header  = struct.Struct('<QddiiiiiIB3xII4x64s') # 128 bytes, keeps points 8 bytes aligned
+    _fields  = ('seq', 'highlightUntil', 'provAcc', 'pos', 'curBatch', 'batches', 'highlight',
+                'provPos', 'count', 'complete', 'capacity', 'generation', 'tag')
+    _seq     = struct.Struct('<Q')
+    _tagSize = 64
+    recheck  = 2.0      # seconds between readers checks of the block generation
+
+    def __init__(self, name:str, capacity:int=4096, owner:bool=False) -> None:
+        '''
+        owner: the evaluator process, that creates the block (replacing a stale one) and unlinks it on close.
+        Other processes only attach, when the block exists, and leave it alone on exit
+        '''
+        self._name     = name
+        self._capacity = capacity
+        self._owner    = owner
+        self._size     = self._header.size + capacity*2*8
+        self._shm      = None
+        self._buf      = None
+        self._points   = None
+        self._generation = 0
+        self._checkAt  = 0.0                # reader: next check of the block generation, time.monotonic()
+        self._lock     = threading.Lock()   # serializes writer threads and remaps in this process
+
+        if owner:
+            try:
+                stale = shared_memory.SharedMemory(name)    #left over by a killed evaluator
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.__map(shared_memory.SharedMemory(name, create=True, size=self._size))
+            self._generation = int.from_bytes(os.urandom(4), 'little') | 1     #0: not initialized
+            self.__write(capacity=capacity, generation=self._generation)
+        else:
+            with self._lock:
+                self.__attach()
+
+
+    def __map(self, shm:shared_memory.SharedMemory) -> None:
+        self._shm    = shm
+        self._buf    = shm.buf
+        self._points = self._buf[self._header.size:self._size].cast('d')
+
+
+    def __unmap(self) -> None:
+        self._points.release()
+        self._points = self._buf = None
+        self._shm.close()
+
+
+    def __attach(self) -> bool:
+        '''
+        reader: map the evaluator block, again if it was created again since it was mapped,
+        checked every recheck seconds. False if it was never created.
+        Called with the lock held
+        '''
+        if self._owner or (self._shm is not None and time.monotonic() < self._checkAt):
+            return self._shm is not None
+        self._checkAt = time.monotonic() + self.recheck
+        try:
+            shm = shared_memory.SharedMemory(self._name)
+        except FileNotFoundError:
+            return self._shm is not None    #evaluator gone: its last progress
+        #attached, not created: this process' resource tracker must not unlink it on exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+        capacity, generation = -1, -1
+        if shm.size >= self._header.size:
+            h = dict(zip(self._fields, self._header.unpack_from(shm.buf, 0)))
+            capacity, generation = h['capacity'], h['generation']
+        if generation in (0, self._generation):     #same block, or new one not initialized yet
+            shm.close()
+            return self._shm is not None
+        if shm.size < self._size or capacity != self._capacity:
+            shm.close()
+            raise RuntimeError(f'evaluation progress shared memory {self._name}: {shm.size} bytes, '
+                               f'{capacity} points, expected at least {self._size} bytes, '
+                               f'{self._capacity} points: check evalProgPoints is the same in every process')
+        if self._shm is not None:
+            self.__unmap()
+        self.__map(shm)
+        self._generation = generation
+        return True
+
+
+    ############################
+    #      Write functions     #
+    ############################
+    def clear(self) -> None:
+        self.__write(tag='', pos=-1, curBatch=0, batches=0, count=0, complete=False,
+                     highlight=-1, highlightUntil=0.0, provAcc=-1.0, provPos=-1)
+
+
+    def new(self, modeltag) -> None:
+        #blink of the previous evaluation goes on while the next one runs
+        self.__write(tag=modeltag, pos=-1, curBatch=0, batches=0, count=0, complete=False,
+                     provAcc=-1.0, provPos=-1)
+
+
+    def add(self, evalAcc:List[Tuple[float, float]]=None, pos:int=None,
+                  batch:Tuple[int, int]=()) -> None:
+        self.__write(evalAcc, pos=pos, curBatch=batch[0], batches=batch[1])
+
+
+    def setComplete(self, c:bool) -> None:
+        self.__write(complete=c)
+
+    def setPosition(self, pos:int) -> int:
+        self.__write(pos=pos)
+
+    def setHighlight(self, pos:int, seconds:float) -> None:
+        '''blink score table position for some seconds, a UI only timer'''
+        self.__write(highlight=pos, highlightUntil=time.time()+seconds)
+
+    def setProvisional(self, acc:float, pos:int) -> None:
+        '''accuracy (%) and position from a subsample, shown until the full run has results'''
+        self.__write(provAcc=acc, provPos=pos)
+
+
+    ############################
+    #      Read functions      #
+    ############################
+    def snapshot(self) -> EvalSnapshot:
+        '''
+        consistent copy of the shared block, retried while the writer is changing it,
+        empty until the evaluator created the block
+        the lock keeps other threads from remapping the block while it is copied,
+        in the owner no writer holds it with an odd seq
+        '''
+        with self._lock:
+            if not self.__attach():
+                return EvalSnapshot()
+            while True:
+                h = self.__readHeader()
+                if h['seq'] % 2 == 0:
+                    acc = self.__readPoints(h['count'])
+                    if self._seq.unpack_from(self._buf, 0)[0] == h['seq']:
+                        return EvalSnapshot(h['tag'], acc, len(acc), h['pos'],
+                                            (h['curBatch'], h['batches']), h['complete'], [],
+                                            h['highlight'], h['highlightUntil'],
+                                            h['provAcc'], h['provPos'])
+                time.sleep(0)   # let the writer finish
+
+    def position(self) -> int:
+        return self.snapshot().pos
+
+    def complete(self) -> bool:
+        return self.snapshot().complete
+
+    def tag(self) -> bool:
+        return self.snapshot().tag
+
+    def evalAcc(self) -> List[Tuple[float, float]]:
+        return self.snapshot().evalAcc()
+
+    def batch(self) -> Tuple[int, int]:
+        return self.snapshot().batch
+
+    def highlighted(self) -> int:
+        return self.snapshot().highlighted()
+
+
+    def close(self) -> None:
+        '''detach, the owner also removes the block'''
+        with self._lock:        #not while a writer thread is changing it
+            if self._shm is None:
+                return
+            self.__unmap()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+
+    ############################
+    #   low level shm access   #
+    ############################
+    def __write(self, point:Tuple[float, float]=None, **fields) -> None:
+        '''
+        Change header fields and append a point if given:
+        odd sequence while writing, next even sequence publishes them
+        '''
+        with self._lock:
+            if self._buf is None:       #closed at exit, evaluator thread still running
+                return
+            h = self.__readHeader()
+            seq = h['seq']
+            self._seq.pack_into(self._buf, 0, seq+1)
+
+            if point is not None:
+                slot = 2*(h['count'] % self._capacity)
+                self._points[slot]   = point[0]
+                self._points[slot+1] = point[1]
+                h['count'] += 1
+
+            h.update(fields)
+            h['seq'] = seq+1
+            h['tag'] = h['tag'].encode('utf-8')[:self._tagSize]
+            self._header.pack_into(self._buf, 0, *[h[f] for f in self._fields])
+            self._seq.pack_into(self._buf, 0, seq+2)
+
+
+    def __readHeader(self) -> Dict[str, Any]:
+        h = dict(zip(self._fields, self._header.unpack_from(self._buf, 0)))
+        h['tag']      = h['tag'].rstrip(b'\0').decode('utf-8', errors='ignore')
+        h['complete'] = bool(h['complete'])
+        return h
+
+
+    def __readPoints(self, count:int) -> List[Tuple[float, float]]:
+        '''last capacity points in order of arrival'''
+        if count <= self._capacity:
+            flat = self._points[:2*count].tolist()
+        else:
+            start = 2*(count % self._capacity)
+            flat  = self._points[start:].tolist() + self._points[:start].tolist()
+        return list(zip(flat[0::2], flat[1::2]))
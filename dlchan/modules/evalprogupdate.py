@@ -1,10 +1,11 @@
 # Update EvaluationProgess instance during evaluation
 # ML/DL run challenge
 #
-#v0.1 nov 2022
+#v0.1 nov 2022, v0.2 oct 2026
 #hdaniel@ualg.pt
 #
 
+import time
 from modules.evalprog import EvaluationProgess
 from modules.score import ScoreRank
 
@@ -12,25 +13,56 @@ from modules.score import ScoreRank
 class EvalProgressUpdate:
     '''
     Auxiliary class to update evaluation progress
+
+    Called on every batch, but only publishes to EvaluationProgess
+    (lock, append and rank lookup) at most points times by evaluation
+    and maxRate times per second. The last batch is always published,
+    as the batch where an early stop ends the evaluation (force).
+    Callers keep their own exact per batch accuracy history.
     '''
+
+    maxRate = 0     # max publications per second, 0 no limit
+    points  = 0     # max chart points by evaluation, 0 every batch
+
+    @classmethod
+    def setup(cls, maxRate:float, points:int) -> None:
+        cls.maxRate = maxRate
+        cls.points  = points
+
+
     def __init__(self, evalProg:EvaluationProgess, batches:int, rank:ScoreRank, params:int) -> None:
         self._evalProg = evalProg
         self._batches  = batches
         self._rank     = rank
         self._params   = params
 
+        self._step     = batches/self.points if self.points > 0 else 0  # batches between points
+        self._period   = 1/self.maxRate if self.maxRate > 0 else 0      # seconds between publications
+        self._next     = 0                                              # next batch to publish
+        self._lastTime = 0.0
+
+
+    def update(self, curAcc:float, curBatch:int, force:bool=False) -> None:
+
+        #skip batches between chart points and above max rate, but never the last one
+        if curBatch+1 < self._batches and not force:
+            if curBatch < self._next:
+                return
+            if self._period > 0:
+                now = time.perf_counter()
+                if now - self._lastTime < self._period:
+                    return
+                self._lastTime = now
+        self._next = curBatch + self._step
 
-    def update(self, curAcc:float, curBatch:int) -> None:
-        
         #current progress bar (may need int) or x-axis position
         curProg = (curBatch+1)/self._batches*100 #convert to range 0-100
 
         #convert current batch accuracy to percentage
         curAccp  = curAcc * 100 #convert to percentage
-        
+
         #set current batch accuracy rank position
         pos = self._rank.findPositionByAccPar(curAccp, self._params)
 
         #add current batch evaluation to list
         self._evalProg.add((curProg, curAccp), pos, (curBatch, self._batches))
-        
\ No newline at end of file
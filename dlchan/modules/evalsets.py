@@ -0,0 +1,72 @@
+#Additional evaluation datasets for ML/DL run challenge
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import pickle, time
+from typing import *
+from numpy.typing import NDArray
+from modules.mdlrankeval import ModelRankEval
+from modules.score import ScoreTable
+
+
+class EvalSet:
+    '''
+    Named evaluation dataset scored after the main one, with its own score table.
+    Each model is evaluated on every set after the same load, without progress chart.
+
+    The dataset is only read on first use, so server processes that do not
+    run the Evaluator never load it. The last shaped version is kept,
+    models of the same input length do not shape it again
+    '''
+
+    def __init__(self, name:str, datasetFN:str, scoreTable:ScoreTable) -> None:
+        self.name       = name
+        self.scoreTable = scoreTable
+        self._datasetFN = datasetFN
+        self._data      : Optional[Tuple[NDArray, NDArray]] = None
+        self._shapedKey : Optional[Tuple] = None
+        self._shaped    : Optional[Tuple[NDArray, NDArray]] = None
+
+
+    @staticmethod
+    def load(datasetFN:str) -> Tuple[NDArray, NDArray]:
+        '''read an evaluation dataset pickle file: X then y, or one dict with {X, Y}'''
+        with open(datasetFN, 'rb') as f:
+
+            #Check if dataset has 2 variables X, y
+            #or just one dict with {X, y}
+            try:
+                X = pickle.load(f)
+                y = pickle.load(f)
+            except:
+                y = X['Y'] # get Y first and X later
+                X = X['X'] # then can rewrite X
+        return X, y
+
+
+    def data(self) -> Tuple[NDArray, NDArray]:
+        if self._data is None:
+            self._data = self.load(self._datasetFN)
+        return self._data
+
+
+    def shaped(self, key:Tuple, shape:Callable[[NDArray, NDArray], Optional[Tuple[NDArray, NDArray]]]
+               ) -> Optional[Tuple[NDArray, NDArray]]:
+        '''dataset shaped by shape(X, y), shaped again only if key (model input) changes'''
+        if key != self._shapedKey:
+            self._shaped    = shape(*self.data())
+            self._shapedKey = key
+        return self._shaped
+
+
+    @staticmethod
+    def evaluate(model:ModelRankEval, data:List[Tuple[NDArray, NDArray]]) -> List[Tuple[float, float, float]]:
+        '''(loss, acc, seconds) of model on each shaped dataset, acc = -1 on error'''
+        results = []
+        for X, y in data:
+            start = time.perf_counter()
+            loss, acc = model.quickEval(X, y)
+            results.append((loss, acc, time.perf_counter() - start))
+        return results
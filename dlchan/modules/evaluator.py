@@ -1,11 +1,13 @@
 #Evaluator for ML/DL run challenge
 #
-#v0.2 aug 2024, v0.3 nov 2024
+#v0.2 aug 2024, v0.3 nov 2024, v0.4 oct 2026
 #hdaniel@ualg.pt
 #
 
 import shutil
-import os, time, pickle, gc, math
+import os, time, gc, math
+import numpy as np
+from datetime import datetime
 from typing import *
 from numpy.typing import NDArray
 from filelock import FileLock
@@ -20,6 +22,13 @@ from modules.evalprog import EvaluationProgess
 from modules.score import ScoreTable, ScoreRank
 from modules.datastorex import Datastore
 from modules.flasklog import FlaskLog
+from modules.metrics import Metrics
+from modules.prefetch import ModelPrefetcher
+from modules.evalbound import EvalBound
+from modules.evalwatchdog import EvalWatchdog
+from modules.batchtune import BatchTuner
+from modules.evalsets import EvalSet
+from modules.curvestore import CurveStore
 
 class Evaluator:
     '''
@@ -30,7 +39,9 @@ class Evaluator:
     def __init__(self, modelSel:ModelSelect, runQueue:RunQueue, evalProg:EvaluationProgess,
                  scoreTable:ScoreTable, scoreLock:FileLock, evalHist:EvalHist, uploadFolder:str,
                  bestFolder:str, evalDatasetFN:str, classes:int, channels:int, maps:int, 
-                 shuffle:bool=False, seed:int=None) -> None:
+                 shuffle:bool=False, seed:int=None, prefetchBudget:int=0,
+                 earlyStop:bool=False, provisional:float=0, watchdog:EvalWatchdog=None,
+                 tuner:BatchTuner=None, evalSets:List[EvalSet]=None, curveStore:CurveStore=None) -> None:
         self._modelSel     = modelSel
         self._runQueue     = runQueue
         self._evalProg     = evalProg
@@ -44,30 +55,108 @@ class Evaluator:
         self._maps         = maps
         self._shuffle      = shuffle
         self._seed         = seed
+        self._earlyStop    = earlyStop
+        self._provisional  = provisional    # fraction of each class in provisional subsample, 0 disables
+        self._provIdx      : Dict[int, NDArray] = {}   # shaped dataset samples: subsample indexes
+        self._watchdog     = watchdog       # evaluate in a child process with limits, None in this thread
+        self._tuner        = tuner          # batch size by model, None fixed 32
+        self._evalSets     = evalSets if evalSets is not None else []   # additional datasets, each with its score table
+        self._curveStore   = curveStore     # accuracy by batch of every evaluation, None not kept
         
-        
-        with open(evalDatasetFN, 'rb') as f:
-            
-            #Check if dataset has 2 variables X, y 
-            #or just one dict with {X, y}
-            try:
-                self._X : NDArray = pickle.load(f)
-                self._y : NDArray = pickle.load(f)
-            except:
-                self._y = self._X['Y'] # get Y first and X later
-                self._X = self._X['X'] # then can rewrite self._X
+        self._X, self._y = EvalSet.load(evalDatasetFN)
 
         #Try to determine number of classes from Y columns, if one_hot encoded.
         #If Y columns is 1 (categorical), then keep value specified in 'dlchan.cfg' file
         if self._y.shape[1] > 1:
             self._classes  = self._y.shape[1]
 
+        #Load next models in queue while evaluating, if memory budget (bytes) allows it
+        self._prefetcher = None
+        if prefetchBudget > 0:
+            self._prefetcher = ModelPrefetcher(runQueue, modelSel, uploadFolder, self.shapeDataset,
+                                               self._X.nbytes + self._y.nbytes, prefetchBudget)
+
+
+    def shapeDataset(self, model:Model, modelTag:str,
+                     X:NDArray=None, y:NDArray=None) -> Optional[Tuple[NDArray, NDArray]]:
+        '''
+        Reshape dataset to model input layer, the evaluation dataset if X, y are not given
+        returns None if model input layer is not 1D or 2D
+        '''
+        inLayerShape = model.inputShape()
+        modelDim     = model.dim()
+        if X is None:
+            X, y = self._X, self._y
+
+        start = time.perf_counter()
+        if   (modelDim == 1):     # 1D Model
+            X, y = Datastore.shape(X, y, self._classes, self._channels, int(inLayerShape[0]/self._channels))
+        elif (modelDim == 2):     # 2D Model
+            X, y = Datastore.shape(X, y, self._classes, self._channels, int(inLayerShape[0]/1))
+            X = Datastore.splitStackChan(X, self._channels, self._maps)
+        else:
+            #todo how to send message to UI?
+            FlaskLog.warning(f'Model {modelTag} input layer is not 1D or 2D')
+            return None
+            #raise RuntimeError('Model input layer is not 1D or 2D')
+        Metrics.observe('stage_seconds', 'stage', 'dataset_shape', time.perf_counter()-start)
+        FlaskLog.warning(f'dataset reshaped to X:{X.shape} y:{y.shape}, for model {modelTag}')
+        return X, y
+
+
+    def shapeSets(self, model:Model, modelTag:str) -> List[Tuple[EvalSet, Tuple[NDArray, NDArray]]]:
+        '''additional datasets shaped to model input layer, the ones that cannot be shaped are skipped'''
+        key = (model.dim(), tuple(model.inputShape()))
+        shaped = []
+        for evalSet in self._evalSets:
+            data = evalSet.shaped(key, lambda X, y: self.shapeDataset(model, f'{modelTag} on {evalSet.name}', X, y))
+            if data is not None:
+                shaped.append((evalSet, data))
+        return shaped
+
+
+    def provisionalIndexes(self, y:NDArray) -> NDArray:
+        '''
+        Seeded stratified subsample of a shaped dataset: the provisional fraction of each class.
+        The dataset is sorted by class, a prefix of it would be a single class.
+        Computed once for each shaped dataset length
+        '''
+        idx = self._provIdx.get(y.shape[0])
+        if idx is None:
+            labels = np.argmax(y, axis=1) if y.ndim > 1 and y.shape[1] > 1 else y.ravel()
+            rng    = np.random.default_rng(self._seed if self._seed is not None else 0)
+            idx    = []
+            for c in np.unique(labels):
+                members = np.flatnonzero(labels == c)
+                n = max(1, int(round(len(members)*self._provisional)))
+                idx.append(rng.choice(members, n, replace=False))
+            idx = np.sort(np.concatenate(idx))
+            self._provIdx[y.shape[0]] = idx
+        return idx
+
+
+    def provisionalEvaluate(self, model:ModelRankEval, X:NDArray, y:NDArray,
+                            rank:ScoreRank, params:int) -> float:
+        '''
+        Quick evaluation on the stratified subsample, publishes provisional accuracy
+        and position until the full evaluation has results. Returns accuracy, -1 on error
+        '''
+        idx = self.provisionalIndexes(y)
+        with Metrics.span('provisional'):
+            loss, acc = model.quickEval(X[idx], y[idx])
+        if acc >= 0:
+            accp = acc * 100
+            self._evalProg.setProvisional(accp, rank.findPositionByAccPar(accp, params))
+            FlaskLog.warning(f'provisional accuracy: {acc:.5f} on {len(idx)} samples')
+        return acc
+
 
     def evaluate(self, model:ModelRankEval, X:NDArray, y:NDArray, 
-                 rank:ScoreRank, batchSize:int=32) -> Tuple[float,float]:
+                 rank:ScoreRank, batchSize:int=32, bound:EvalBound=None) -> Tuple[float,float]:
         '''
         evaluates  model on dataset (X, y) by batches and returns:
         (eval loss, eval final accuracy, eval acuraccy history by batch)
+        if bound is given and the model cannot improve its score, it stops early
         '''
 
         #compute number of batches needed
@@ -75,33 +164,90 @@ class Evaluator:
         nBatches = int(math.ceil(samples/batchSize))
 
         #Evaluate with subclass specific evaluator
+        start = time.perf_counter()
         (loss, acc, accHist) = model.rankEval(X, y, self._evalProg,
                                               rank, nBatches, batchSize,
-                                              self._shuffle, self._seed)
+                                              self._shuffle, self._seed, bound)
+        seconds = time.perf_counter() - start
+        Metrics.observe('stage_seconds', 'stage', 'inference', seconds)
+        if acc >= 0:
+            Metrics.throughput(samples, seconds)
         gc.collect()
         return (loss, acc, accHist)
 
 
+    def evaluateIsolated(self, modelFN:str, X:NDArray, y:NDArray, rank:ScoreRank,
+                         batchSize:int=32, bound:EvalBound=None,
+                         provIdx:NDArray=None, extra:List[Tuple[NDArray, NDArray]]=None,
+                         tuneKey:Tuple[str, str]=None
+                         ) -> Tuple[float, float, List[float], Optional[str], List[Tuple[float, float, float]]]:
+        '''
+        evaluate() in a watchdog child process, that loads the model from modelFN,
+        probes its batch size if tuneKey is given (not cached, see BatchTuner.key)
+        and first runs the provisional evaluation if provIdx is given,
+        then EvalSet.evaluate() on the extra shaped datasets. Returns:
+        (eval loss, eval final accuracy, eval acuraccy history by batch, status, extra results)
+        status is None or EvalHist.TIMEOUT / KILLED if the child was stopped
+        '''
+        samples  = X.shape[0]
+        nBatches = int(math.ceil(samples/batchSize))
+        tuner    = self._tuner if tuneKey is not None else None
+
+        start = time.perf_counter()
+        (loss, acc, accHist, status, extraResults, tuned) = self._watchdog.run(modelFN, X, y, self._evalProg, rank,
+                                                                               nBatches, batchSize, bound, provIdx,
+                                                                               extra, tuner)
+        seconds = time.perf_counter() - start
+        if tuned is not None:
+            best, rate, probeSeconds = tuned
+            Metrics.observe('stage_seconds', 'stage', 'batch_tune', probeSeconds)
+            self._tuner.store(tuneKey, best, rate)
+            seconds -= probeSeconds
+        Metrics.observe('stage_seconds', 'stage', 'inference', seconds)
+        if acc >= 0:
+            Metrics.throughput(samples, seconds)
+        return (loss, acc, accHist, status, extraResults)
+
+
 
-    def evaluatorThread(self, period:int)->None:
+    def commitSets(self, modelTag:str, model:Model, params:int,
+                   sets:List[Tuple[EvalSet, Tuple[NDArray, NDArray]]],
+                   results:List[Tuple[float, float, float]]) -> None:
+        '''update each additional dataset score table and the evaluation history with its results'''
+        for (evalSet, data), (loss, acc, seconds) in zip(sets, results):
+            if acc < 0:
+                FlaskLog.warning(f'error evaluating {modelTag} on {evalSet.name}')
+                continue
+            acc = round(acc * data[0].shape[0]) / data[0].shape[0]
+            isUpdated = evalSet.scoreTable.update(modelTag, acc, loss, params, [])
+            self._evalHist.add(modelTag, acc, loss, params, isUpdated, seconds,
+                               cost=model.costPerInput(), kind=model.costFamily(), evalSet=evalSet.name)
+            FlaskLog.warning(f'{evalSet.name} accuracy: {acc:.5f}, score table updated: {isUpdated}')
+
+
+    def evaluatorThread(self, period:int, blink:int=5)->None:
         '''
-        Periodic Thread that checks RUNQUEUE every period seconds
+        Thread that evaluates models from RUNQUEUE:
+        it is woken up when a model is added, or checks RUNQUEUE every period seconds
         IF filled run evaluate()
+
+        The score table position of an evaluated model blinks for blink seconds,
+        while the next model is already being evaluated
         '''
 
+        if self._prefetcher is not None:
+            self._prefetcher.start()
+
         #Shared EvaluationProgress instance
         #Make sure only one model is evaluated at a time
         while True:
-            time.sleep(period)   #Wait some time before start evaluating another model: let them see it blinking
-                                 #(no timer needed, does not need to be that accurate)
-            if self._evalProg.complete(): 
-                self._evalProg.setComplete(False) #stop flashing score table
-                FlaskLog.warning(f'stop blinking')
-            
             with self._scoreLock:
-                filename = self._runQueue.get()
+                entry = self._runQueue.get(date=True)
                 
-                if filename is not None:
+                if entry is not None:
+                    filename, queued = entry
+                    Metrics.observe('stage_seconds', 'stage', 'queue_wait',
+                                    (datetime.now()-queued).total_seconds())
                     FlaskLog.warning(f'Evaluating model: {filename}')
                     modelFN = os.path.join(self._uploadFolder, filename)
                     modelTag = filename.rsplit('.', 1)[0]
@@ -112,10 +258,20 @@ class Evaluator:
                     # current position in the score table
                     #
                     # reading here is faster than reading in each batch
-                    rank = ScoreRank(self._scoreTable)
+                    with Metrics.span('score_rank'):
+                        rank = ScoreRank(self._scoreTable)
+
+                    # get model config, already loaded if prefetched
+                    prefetched = None
+                    if self._prefetcher is not None:
+                        prefetched = self._prefetcher.take(filename)
 
-                    # get model config 
-                    model:Model = self._modelSel.fromFile(modelFN)
+                    if prefetched is not None:
+                        model:Model = prefetched.model
+                        Metrics.inc('prefetch_hits_total')
+                    else:
+                        with Metrics.span('model_load'):
+                            model:Model = self._modelSel.fromFile(modelFN)
                     if model is None:
                         #todo: this happens for valid models, but only sometimes
                         #Why? unsyncing threads?
@@ -126,34 +282,86 @@ class Evaluator:
                     else:
                         FlaskLog.warning(f'model type is: {model.name()}')
                     
-                    inLayerShape = model.inputShape()
-                    modelDim     = model.dim()
                     params  = model.modelCountParams()    #Model total parameters
                     
-                    #Reshape dataset to model input layer
-                    evaluate = True
-                    if   (modelDim == 1):     # 1D Model
-                        X, y = Datastore.shape(self._X, self._y, self._classes, self._channels, int(inLayerShape[0]/self._channels))
-                    elif (modelDim == 2):     # 2D Model
-                        X, y = Datastore.shape(self._X, self._y, self._classes, self._channels, int(inLayerShape[0]/1))
-                        X = Datastore.splitStackChan(X, self._channels, self._maps)
+                    #Reshape dataset to model input layer, already shaped if prefetched
+                    if prefetched is not None:
+                        data = prefetched.data
                     else:
-                        #todo how to send message to UI?
-                        FlaskLog.warning(f'Model {modelTag} input layer is not 1D or 2D')
-                        evaluate = False
-                        #raise RuntimeError('Model input layer is not 1D or 2D')
-                    FlaskLog.warning(f'dataset reshaped to X:{X.shape} y:{y.shape}, for model {modelTag}')
-
-                    if evaluate:
-                        loss, acc, accHist = self.evaluate(model, X, y, rank)
+                        data = self.shapeDataset(model, modelTag)
+
+                    if data is not None:
+                        X, y = data
+
+                        #batch size probe runs the model: in the watchdog child if isolated
+                        batchSize, tuneKey = 32, None
+                        if self._tuner is not None and self._watchdog is not None:
+                            tuneKey = self._tuner.key(model, modelFN)
+                            cached  = self._tuner.cached(tuneKey)
+                            if cached is not None:
+                                batchSize, tuneKey = cached, None
+                        elif self._tuner is not None:
+                            batchSize = self._tuner.choose(model, modelFN, X)
+
+                        #stop evaluation if the model cannot beat its tag best score
+                        bound = None
+                        if self._earlyStop:
+                            bound = EvalBound(X.shape[0], batchSize, self._scoreTable.findAccByTag(modelTag))
+
+                        #additional datasets, evaluated after the main one with the same model load
+                        sets = self.shapeSets(model, modelTag)
+                        extra = [data for evalSet, data in sets]
+
+                        #provisional score from a subsample, replaced by the full run
+                        evalStart = time.perf_counter()
+                        if self._watchdog is not None:
+                            provIdx = self.provisionalIndexes(y) if self._provisional > 0 else None
+                            loss, acc, accHist, status, extraResults = self.evaluateIsolated(
+                                                        modelFN, X, y, rank, batchSize, bound, provIdx, extra,
+                                                        tuneKey)
+                            evalSeconds = time.perf_counter() - evalStart - sum(r[2] for r in extraResults)
+                        else:
+                            if self._provisional > 0:
+                                self.provisionalEvaluate(model, X, y, rank, params)
+                            loss, acc, accHist = self.evaluate(model, X, y, rank, batchSize, bound)
+                            status = None
+                            evalSeconds = time.perf_counter() - evalStart
+                            extraResults = []
+                            if acc >= 0 and (bound is None or not bound.stopped):
+                                extraResults = EvalSet.evaluate(model, extra)
+                        #job time for queue estimates: main evaluation and additional datasets
+                        jobSeconds = evalSeconds + sum(r[2] for r in extraResults)
+                        #float32 batch means: round to a count of correct samples, same for any batch size
+                        if acc >= 0 and status is None and not (bound is not None and bound.stopped):
+                            acc = round(acc * X.shape[0]) / X.shape[0]
                         FlaskLog.warning(f'evaluated accuracy: {acc:.5f}')
 
+                        commitStart = time.perf_counter()
                         isUpdated = False
-                        if acc >= 0:
+                        if status is not None:
+                            #watchdog stopped it: record its status, the queue goes on
+                            Metrics.inc('eval_killed_total')
+                            self._evalHist.add(modelTag, 0, 0, params, False, jobSeconds, status=status)
+                            FlaskLog.warning(f'added to evaluation history: {modelTag} status {status}')
+                        elif acc >= 0 and bound is not None and bound.stopped:
+                            #not improved: record the accuracy bound, partial duration is not an estimate
+                            saved = evalSeconds * (X.shape[0] - bound.seen) / bound.seen
+                            Metrics.inc('early_stop_saved_seconds_total', saved)
+                            FlaskLog.warning(f'evaluation stopped at {bound.seen}/{X.shape[0]} samples, '
+                                             f'accuracy <= {bound.maxAcc:.5f}, saved about {saved:.1f}s')
+                            self._evalHist.add(modelTag, bound.maxAcc, loss, params, False,
+                                               status=EvalHist.STOPPED)
+                            FlaskLog.warning(f'added to evaluation history: {modelTag}')
+                        elif acc >= 0:
                             isUpdated = self._scoreTable.update(modelTag, acc, loss, params, accHist)
                             FlaskLog.warning(f'score table updated: {isUpdated}')
-                            self._evalHist.add(modelTag, acc, loss, params, isUpdated)
+                            self._evalHist.add(modelTag, acc, loss, params, isUpdated, jobSeconds,
+                                               cost=model.costPerInput(), kind=model.costFamily(),
+                                               size=os.path.getsize(modelFN))   #before it is moved or removed
                             FlaskLog.warning(f'added to evaluation history: {modelTag}')
+                            if self._curveStore is not None:
+                                self._curveStore.add(modelTag, accHist)
+                            self.commitSets(modelTag, model, params, sets, extraResults)
                         else:
                             FlaskLog.warning(f'error evaluating model stored in: {filename}')
                                                                 
@@ -173,7 +381,13 @@ class Evaluator:
                             curPos = self._scoreTable.findPositionByTag(modelTag)
                             self._evalProg.setPosition(curPos)
                             os.remove(modelFN)
+                        Metrics.observe('stage_seconds', 'stage', 'score_commit', time.perf_counter()-commitStart)
                                                 
-                        self._evalProg.setComplete(True)  #blink
+                        self._evalProg.setComplete(True)
+                        self._evalProg.setHighlight(self._evalProg.position(), blink)
                         FlaskLog.warning(f'start blinking')
 
+            #Empty queue: wait for a model to be added
+            if entry is None:
+                self._runQueue.wait(period)
+
@@ -0,0 +1,200 @@
+#Evaluation watchdog for ML/DL run challenge
+#Runs each evaluation in a child process with wall clock, CPU and memory limits
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import math, multiprocessing, resource, time
+from multiprocessing.connection import Connection
+from typing import *
+from numpy.typing import NDArray
+#from modules.modelsel import ModelSelect
+from modelsel import ModelSelect
+from modules.evalprog import EvaluationProgess
+from modules.evalprogupdate import EvalProgressUpdate
+from modules.mdlRkEvKeras import ModelRkEvKeras
+from modules.evalbound import EvalBound
+from modules.batchtune import BatchTuner
+from modules.evalsets import EvalSet
+from modules.score import ScoreRank
+from modules.evalhist import EvalHist
+from modules.flasklog import FlaskLog
+
+
+class PipeProgress:
+    '''
+    EvaluationProgess stand in for the child process:
+    sends the progress writes to the Evaluator process, that applies them
+    '''
+
+    def __init__(self, conn:Connection) -> None:
+        self._conn = conn
+
+    def add(self, evalAcc:Tuple[float, float]=None, pos:int=None, batch:Tuple[int, int]=()) -> None:
+        self._conn.send(('add', evalAcc, pos, batch))
+
+    def setProvisional(self, acc:float, pos:int) -> None:
+        self._conn.send(('setProvisional', acc, pos))
+
+
+def _evalChild(conn:Connection, modelSel:ModelSelect, modelFN:str, X:NDArray, y:NDArray,
+               rank:ScoreRank, batches:int, batchSize:int, shuffle:bool, seed:int,
+               bound:EvalBound, provIdx:Optional[NDArray],
+               progress:Tuple[float, int], engine:Tuple[str, int, float],
+               limits:Tuple[int, int], extra:List[Tuple[NDArray, NDArray]],
+               tuner:Optional[BatchTuner]) -> None:
+    '''child process: load the model, probe its batch size and evaluate it, send results through conn'''
+    cpu, memory = limits
+    if cpu > 0:     #SIGXCPU at the soft limit, SIGKILL at the hard one
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu+5))
+    if memory > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    #class settings of the Evaluator process, the forkserver has the defaults
+    EvalProgressUpdate.setup(*progress)
+    ModelRkEvKeras.setup(*engine)
+    evalProg = PipeProgress(conn)
+
+    try:
+        conn.send(_evalRun(evalProg, modelSel, modelFN, X, y, rank, batches, batchSize, shuffle, seed,
+                           bound, provIdx, extra, tuner))
+    except MemoryError:
+        raise       #address space rlimit: the child dies, recorded as killed
+    except Exception as e:
+        #evaluation error, not a crash: acc = -1 as a model that does not load
+        conn.send(('error', f'{type(e).__name__}: {e}'))
+        conn.send(('done', (0, -1, []), bound, [], None))
+
+
+def _evalRun(evalProg:PipeProgress, modelSel:ModelSelect, modelFN:str, X:NDArray, y:NDArray,
+             rank:ScoreRank, batches:int, batchSize:int, shuffle:bool, seed:int,
+             bound:EvalBound, provIdx:Optional[NDArray], extra:List[Tuple[NDArray, NDArray]],
+             tuner:Optional[BatchTuner]) -> Tuple:
+    '''_evalChild body, returns its done message'''
+    model = modelSel.fromFile(modelFN)
+    if model is None:
+        return ('done', (0, -1, []), bound, [], None)
+
+    #batch size probe runs the model: inside the limits, as the evaluation
+    tuned = None
+    if tuner is not None:
+        start = time.perf_counter()
+        best, rate = tuner.probe(model, X)
+        tuned = (best, rate, time.perf_counter() - start)
+        if best is not None:
+            batchSize = best
+            batches   = int(math.ceil(X.shape[0]/batchSize))
+            if bound is not None:
+                bound.setBatchSize(batchSize)
+
+    #provisional score from a subsample, replaced by the full run below
+    if provIdx is not None:
+        loss, acc = model.quickEval(X[provIdx], y[provIdx])
+        if acc >= 0:
+            accp = acc * 100
+            evalProg.setProvisional(accp, rank.findPositionByAccPar(accp, model.modelCountParams()))
+
+    result = model.rankEval(X, y, evalProg, rank, batches, batchSize, shuffle, seed, bound)
+
+    #additional datasets, only for a finished evaluation
+    extraResults = []
+    if result[1] >= 0 and (bound is None or not bound.stopped):
+        extraResults = EvalSet.evaluate(model, extra)
+    return ('done', result, bound, extraResults, tuned)
+
+
+
+class EvalWatchdog:
+    '''
+    Evaluates a model file in a child process, so that one pathological model
+    (a KNN over a large training set, a huge Conv2D) cannot hold the Evaluator:
+        the child is killed after timeout wall clock seconds,
+        its CPU seconds and address space (bytes) are limited with rlimits, 0 no limit
+    Progress written by the child is applied to the Evaluator EvaluationProgess.
+
+    Children are forked from a forkserver that preloads the evaluation modules,
+    so Keras is not imported again for each evaluation.
+    '''
+
+    def __init__(self, modelSel:ModelSelect, timeout:float, cpuLimit:int=0, memoryLimit:int=0,
+                 shuffle:bool=False, seed:int=None, python:str='') -> None:
+        self._modelSel = modelSel
+        self._timeout  = timeout
+        self._limits   = (cpuLimit, memoryLimit)
+        self._shuffle  = shuffle
+        self._seed     = seed
+
+        self._ctx = multiprocessing.get_context('forkserver')
+        self._ctx.set_forkserver_preload(['modules.mdlRkEvKeras', 'modules.mdlRkEvSKL',
+                                          'modules.evalwatchdog'])
+        if python != '':
+            self._ctx.set_executable(python)     #server embedded python: sys.executable is not python
+
+
+    def run(self, modelFN:str, X:NDArray, y:NDArray, evalProg:EvaluationProgess,
+            rank:ScoreRank, batches:int, batchSize:int=32, bound:EvalBound=None,
+            provIdx:Optional[NDArray]=None, extra:List[Tuple[NDArray, NDArray]]=None,
+            tuner:BatchTuner=None
+            ) -> Tuple[float, float, List[float], Optional[str], List[Tuple[float, float, float]],
+                       Optional[Tuple[Optional[int], float, float]]]:
+        '''
+        returns (loss, acc, accHist, status, extraResults, tuned):
+        status is None if the child finished, acc = -1 on evaluation error (exception in the child, logged),
+        EvalHist.TIMEOUT or EvalHist.KILLED (by rlimits or a crash) with acc = -1
+        extraResults: (loss, acc, seconds) for each extra shaped dataset, see EvalSet.evaluate,
+        empty if the evaluation did not finish
+        tuned: (batch size, samples/s, seconds) of tuner.probe() in the child, see BatchTuner.probe,
+        None if no tuner was given or the child did not finish;
+        batches and batchSize are then recomputed in the child
+        bound is updated with the child one
+        '''
+        extra = extra if extra is not None else []
+        parentConn, childConn = self._ctx.Pipe(duplex=False)
+        progress = (EvalProgressUpdate.maxRate, EvalProgressUpdate.points)
+        engine   = (ModelRkEvKeras.engine, ModelRkEvKeras.threads, ModelRkEvKeras.tolerance)
+        child = self._ctx.Process(target=_evalChild, daemon=True,
+                                  args=(childConn, self._modelSel, modelFN, X, y, rank, batches, batchSize,
+                                        self._shuffle, self._seed, bound, provIdx, progress, engine,
+                                        self._limits, extra, tuner))
+        child.start()
+        childConn.close()   #only the child writes: EOF when it exits
+
+        result, status = None, EvalHist.KILLED
+        deadline = time.monotonic() + self._timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    status = EvalHist.TIMEOUT
+                    break
+                if not parentConn.poll(min(remaining, 1)):
+                    continue
+                try:
+                    msg = parentConn.recv()
+                except EOFError:
+                    break           #child died without result
+                if msg[0] == 'error':
+                    FlaskLog.warning(f'evaluation child error for {modelFN}: {msg[1]}')
+                    continue
+                if msg[0] == 'done':
+                    result, childBound, extraResults, tuned = msg[1], msg[2], msg[3], msg[4]
+                    status = None
+                    break
+                getattr(evalProg, msg[0])(*msg[1:])
+        finally:
+            parentConn.close()
+            if status is None:
+                child.join(5)
+            if child.is_alive():
+                child.kill()
+            child.join()        #reap it
+
+        if status is not None:
+            FlaskLog.warning(f'evaluation child {"timed out" if status == EvalHist.TIMEOUT else "killed"}'
+                             f' for {modelFN}, exit code {child.exitcode}')
+            return (0, -1, [], status, [], None)
+
+        if bound is not None and childBound is not None:
+            vars(bound).update(vars(childBound))
+        loss, acc, accHist = result
+        return (loss, acc, accHist, None, extraResults, tuned)
@@ -1,39 +1,85 @@
 #Flask log wrapper for ML/DL run challenge web app
 #
-#v0.1 nov 2024
+#v0.1 nov 2024, v0.2 oct 2026
 #hdaniel@ualg.pt
 #
 
-import logging
+import atexit, json, logging, queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from enum import Enum
 
 
+class JsonFormatter(logging.Formatter):
+    '''one JSON object by line: time, level, msg and the stage/seconds extra fields if given'''
+
+    def format(self, record:logging.LogRecord) -> str:
+        entry = {'time': self.formatTime(record), 'level': record.levelname, 'msg': record.getMessage()}
+        for field in ('stage', 'seconds'):
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        return json.dumps(entry)
+
+
 class FlaskLog:
+    '''
+    Log calls only put the record in a queue, a listener thread writes them,
+    so request threads and the Evaluator never wait for the log file.
+    The file is rotated at maxBytes, keeping backups files, 0 never rotated
+    '''
 
     INFO  = logging.INFO
     WARN  = logging.WARNING
     ERROR = logging.ERROR
 
     _logger = logging.getLogger("werkzeug")
+    _listener : QueueListener = None
+    _stages = False     # log evaluation stage durations
 
     @classmethod
     def clearLogFile(cls) -> None:
         ''' open for writting clear the file'''
-        try: 
+        try:
             with open(cls._logFN, 'w'):
                     pass
-        except: 
+        except:
             pass
 
     @classmethod
-    def setup(cls, logFN:str, level='WARN') -> None:      
-        cls._logFN = logFN
-        logging.basicConfig(filename=logFN, encoding='utf-8', 
-                            format='%(asctime)s %(levelname)s: %(message)s')
+    def setup(cls, logFN:str, level='WARN', maxBytes:int=0, backups:int=5,
+              jsonLines:bool=False, stages:bool=False) -> None:
+        cls._logFN  = logFN
+        cls._stages = stages
+        if maxBytes > 0:
+            handler = RotatingFileHandler(logFN, maxBytes=maxBytes, backupCount=backups, encoding='utf-8')
+        else:
+            handler = logging.FileHandler(logFN, encoding='utf-8')
+        if jsonLines:
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
+
+        #root logger only queues records, as basicConfig it gets the werkzeug ones too
+        if cls._listener is not None:
+            cls._listener.stop()
+        logQueue = queue.SimpleQueue()
+        queueHandler = QueueHandler(logQueue)
+        queueHandler.setFormatter(logging.Formatter('%(message)s'))  #the file handler formats it
+        logging.basicConfig(handlers=[queueHandler], force=True)
+        cls._listener = QueueListener(logQueue, handler)
+        cls._listener.start()
+        atexit.register(cls.stop)
+
         # cannot use FlaskLog constants inside class as default parameters
         # so, do it this way:
         level_value = getattr(cls, level) if isinstance(level, str) else level
-        cls.setLevel(level_value)                            
+        cls.setLevel(level_value)
+
+    @classmethod
+    def stop(cls) -> None:
+        '''write queued records and stop the listener thread'''
+        if cls._listener is not None:
+            cls._listener.stop()
+            cls._listener = None
 
     @classmethod
     def setLevel(cls, level) -> None:
@@ -51,6 +97,13 @@ class FlaskLog:
     def error(cls, msg:str) -> None:
         cls._logger.error(msg)
 
+    @classmethod
+    def stage(cls, stage:str, seconds:float) -> None:
+        '''evaluation stage duration, if enabled: stage and seconds fields in JSON lines'''
+        if cls._stages:
+            cls._logger.warning(f'stage {stage}: {seconds:.4f}s',
+                                extra={'stage': stage, 'seconds': round(seconds, 6)})
+
     @classmethod
     def clear(cls) -> None:
         cls._logger.error(msg)
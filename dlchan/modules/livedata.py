@@ -0,0 +1,106 @@
+#Live data served by the polling routes of ML/DL run challenge
+#Shared by the WSGI (views.py) and ASGI (asgi.py) entry points
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+from datetime import datetime, timedelta
+import json
+from typing import *
+from modules.runqueue import RunQueue
+from modules.evalprog import EvaluationProgess
+from modules.score import ScoreTable
+from modules.queuepolicy import JobEstimator
+
+
+class LiveData:
+    '''
+    Builds the payloads of the live endpoints: /_running, /_ranking, /_waiters and /_timeleft
+    from the same EvaluationProgess, ScoreTable and RunQueue instances used by the Evaluator
+    '''
+
+    accPrecision = 5
+
+    def __init__(self, evalProg:EvaluationProgess, scoreTable:ScoreTable, runQueue:RunQueue,
+                 evalDatasetName:str, challengeEnd:datetime, estimator:JobEstimator=None,
+                 setTables:Dict[str, ScoreTable]=None) -> None:
+        self._evalProg        = evalProg
+        self._scoreTable      = scoreTable
+        self._runQueue        = runQueue
+        self._estimator       = estimator
+        self._evalDatasetName = evalDatasetName
+        self._challengeEnd    = challengeEnd
+        self._setTables       = setTables if setTables is not None else {}   # additional dataset name: its score table
+
+
+    def timeleft(self) -> Dict:
+        if self._challengeEnd < datetime.now():
+            timeleft='00:00:00'
+        else:
+            td:timedelta = (self._challengeEnd-datetime.now())
+            hours, remainder = divmod(int(td.total_seconds()), 3600)
+            minutes, seconds = divmod(remainder, 60)
+            timeleft='{:d}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+        return dict(time=timeleft, set=self._evalDatasetName)
+
+
+    def waiters(self) -> Dict:
+        pending = self._runQueue.pending()
+        top3waiters = [entry[0] for entry in pending[:3]]
+
+        #whole queue with estimated seconds to start, null if unknown
+        etas = [None]*len(pending)
+        if self._estimator is not None:
+            etas = self._estimator.etas(pending)
+        queue = [[entry[0], round(eta) if eta is not None else None]
+                 for entry, eta in zip(pending, etas)]
+        return dict(waiters=top3waiters, queue=queue)
+
+
+    def ranking(self, evalSet:str=None) -> Optional[Dict]:
+        '''
+        score table of the main dataset, or of the additional dataset named evalSet
+        None if there is no dataset with that name
+        '''
+        if evalSet:
+            if evalSet not in self._setTables:
+                return None
+            scoreTable = self._setTables[evalSet]
+            hl = -1     #the highlight is the main dataset position
+        else:
+            scoreTable = self._scoreTable
+            #Shared EvaluationProgress instance
+            #highlight table position of the last evaluation, or -1 out of table: do not highlight
+            hl = self._evalProg.highlighted()
+
+        #set acc precision for rank table
+        l = scoreTable.get()
+        score = [ [e[0], "{0:.{1:}f}".format(e[1], LiveData.accPrecision), e[2]]
+                for e in l]
+
+        return dict(rank=score, highlight=hl, set=evalSet or self._evalDatasetName,
+                    sets=list(self._setTables))
+
+
+    def running(self) -> bytes:
+        '''
+        JSON body: the top history is the fragment kept by the ScoreTable,
+        spliced in, instead of being encoded again on every poll
+        '''
+        #Shared EvaluationProgress instance, single consistent snapshot
+        prog = self._evalProg.snapshot()
+        [topName, topHist, data] = self._scoreTable.top()
+
+        #Format batch counter
+        curBatch, batches = prog.batch
+        batchCounter = "{0:0{1:d}d}/{2:d}". \
+        format(curBatch+1, len(str(batches)), batches)
+
+        #provisional accuracy and position from a subsample, -1 if not evaluated yet
+        body = json.dumps(dict(tag=prog.tag, acc=prog.evalAcc(),
+                               position=prog.pos, batches=batchCounter,
+                               topName=topName,
+                               provAcc=round(prog.provAcc, LiveData.accPrecision), provPosition=prog.provPos),
+                          default=float, separators=(',', ':'))
+        return (body[:-1] + ',"topHist":' + topHist + '}').encode()
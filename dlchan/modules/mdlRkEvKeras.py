@@ -1,12 +1,13 @@
 #Model operations for ML/DL run challenge
 #
 #v0.1 jul 2022, v0.2 aug 2024, v0.3 nov 2024
-#v0.4 jan 2025
+#v0.4 jan 2025, v0.5 oct 2026
 #hdaniel@ualg.pt
 #
 
 from abc import abstractmethod
-import keras
+import keras, os, tempfile
+import numpy as np
 from typing import *
 from numpy.typing import NDArray
 from modules.evalprog import EvaluationProgess
@@ -15,35 +16,163 @@ from modules.evalprogupdate import EvalProgressUpdate
 from modelKeras import ModelKeras
 from modules.mdlrankeval import ModelRankEval
 from modules.score import ScoreRank
+from modules.evalbound import EvalBound
+from modules.flasklog import FlaskLog
 
 
 class ModelRkEvKeras(ModelKeras, ModelRankEval):
+    '''
+    Keras models evaluation, by default with model.evaluate().
+    Optionally on an optimized CPU engine, both within TensorFlow:
+        'xla'     model compiled with jit_compile
+        'tflite'  model converted to a TFLite interpreter with threads threads
+    The engine is checked on checkSamples samples: if its predictions differ from
+    the Keras ones more than tolerance, or the conversion fails, Keras is used
+    '''
+
+    engine       = 'keras'  # 'keras', 'xla' or 'tflite'
+    threads      = 0        # TFLite interpreter threads, 0 all cores
+    tolerance    = 1e-4     # max absolute difference of predictions
+    checkSamples = 64
+    _jit         = False    # XLA checked for this model
+
+    @classmethod
+    def setup(cls, engine:str, threads:int=0, tolerance:float=1e-4) -> None:
+        if engine not in ('keras', 'xla', 'tflite'):
+            raise ValueError(f'unknown Keras engine: {engine}')
+        cls.engine    = engine
+        cls.threads   = threads
+        cls.tolerance = tolerance
+
 
     def _rawRankEval(self, X:NDArray, y:NDArray, batchSize:int=32, callbacks:keras.callbacks=[]) -> Tuple[float, float]:
         
         #Ignore metrics defined in model and
         #use just accuracy to evaluate the model
-        self._model.compile(loss=self._model.loss, metrics=self._metrics)
+        self._model.compile(loss=self._model.loss, metrics=self._metrics,
+                            jit_compile=self._jit)
     
         loss, acc = self._model.evaluate(X, y, batch_size=batchSize, callbacks=callbacks, verbose=0)
         return loss, acc
 
 
     def _rankEval(self, X:NDArray, y:NDArray, evalProg:EvaluationProgess, 
-                 rank:ScoreRank, batches:int, batchSize:int=32) -> Tuple[float,float,List[float]]:
+                 rank:ScoreRank, batches:int, batchSize:int=32,
+                 bound:EvalBound=None) -> Tuple[float,float,List[float]]:
         '''
         Subclass dependant evaluation part
         '''
         #Initialize
         accHist = []
         params  = self.modelCountParams()    
-        callbacks = [ EvalProgressUpdateCB(accHist, evalProg, batches, rank, params) ]
+
+        interpreter = self._selectEngine(X)
+        if interpreter is not None:
+            return self._tfliteRankEval(interpreter, X, y, evalProg, rank, batches, batchSize, bound)
+
+        callbacks = [ EvalProgressUpdateCB(accHist, evalProg, batches, rank, params, bound) ]
         
         loss, acc = self._rawRankEval(X, y, batchSize, callbacks)
     
         return loss, acc, accHist
 
 
+    def predictBatches(self, X:NDArray, batchSize:int) -> None:
+        self._model.predict(X, batch_size=batchSize, verbose=0)
+
+
+    ########################
+    #   optimized engines  #
+    ########################
+    def _selectEngine(self, X:NDArray) -> Optional[Any]:
+        '''
+        Set self._jit for XLA, or return a TFLite interpreter,
+        if its predictions match Keras ones on a sample. None: use Keras
+        '''
+        self._jit = False
+        if self.engine == 'keras':
+            return None
+
+        Xs = X[:self.checkSamples]
+        try:
+            self._model.compile(loss=self._model.loss, metrics=self._metrics)
+            ref = self._model.predict(Xs, verbose=0)
+
+            if self.engine == 'xla':
+                self._model.compile(loss=self._model.loss, metrics=self._metrics, jit_compile=True)
+                diff = np.max(np.abs(self._model.predict(Xs, verbose=0) - ref))
+                if diff <= self.tolerance:
+                    self._jit = True
+                    FlaskLog.warning(f'evaluating with XLA, max prediction difference {diff:.2g}')
+                    return None
+            else:
+                interpreter = self._tflite()
+                diff = np.max(np.abs(self._tflitePredict(interpreter, Xs) - ref))
+                if diff <= self.tolerance:
+                    FlaskLog.warning(f'evaluating with TFLite, max prediction difference {diff:.2g}')
+                    return interpreter
+            FlaskLog.warning(f'{self.engine} predictions differ from Keras by {diff:.2g}, evaluating with Keras')
+        except Exception as e:
+            FlaskLog.warning(f'{self.engine} conversion failed, evaluating with Keras: {e}')
+        return None
+
+
+    def _tflite(self) -> Any:
+        import tensorflow as tf
+        try:
+            converter = tf.lite.TFLiteConverter.from_keras_model(self._model)
+            content   = converter.convert()
+        except Exception:
+            #Keras 3 models convert from an exported SavedModel
+            with tempfile.TemporaryDirectory(prefix='dlchan-tflite-') as folder:
+                self._model.export(folder)
+                content = tf.lite.TFLiteConverter.from_saved_model(folder).convert()
+        return tf.lite.Interpreter(model_content=content, num_threads=self.threads or os.cpu_count())
+
+
+    def _tflitePredict(self, interpreter:Any, X:NDArray) -> NDArray:
+        inp = interpreter.get_input_details()[0]
+        out = interpreter.get_output_details()[0]
+        if tuple(inp['shape']) != X.shape:      #first call or last, smaller, batch
+            interpreter.resize_tensor_input(inp['index'], X.shape)
+            interpreter.allocate_tensors()
+        interpreter.set_tensor(inp['index'], X.astype(inp['dtype'], copy=False))
+        interpreter.invoke()
+        return interpreter.get_tensor(out['index'])
+
+
+    def _tfliteRankEval(self, interpreter:Any, X:NDArray, y:NDArray, evalProg:EvaluationProgess, 
+                        rank:ScoreRank, batches:int, batchSize:int,
+                        bound:EvalBound=None) -> Tuple[float,float,List[float]]:
+        '''batch loop as model.evaluate(): running accuracy and mean loss'''
+        batch   = 0
+        correct = 0
+        lossSum = 0.0
+        accHist = []
+        samples = X.shape[0]
+        lossFn  = keras.losses.get(self._model.loss)
+        evalProgressUpdate = EvalProgressUpdate(evalProg, batches, rank, self.modelCountParams())
+
+        for start in range(0, samples, batchSize):
+            end  = min(start + batchSize, samples)
+            pred = self._tflitePredict(interpreter, X[start:end])
+            yn   = y[start:end]
+
+            labels   = np.argmax(yn, axis=1) if yn.ndim > 1 and yn.shape[1] > 1 else yn.ravel()
+            correct += int(np.sum(np.argmax(pred, axis=1) == labels))
+            lossSum += float(np.mean(keras.ops.convert_to_numpy(lossFn(yn, pred)))) * (end-start)
+            acumAcc  = correct / end
+            accHist.append(acumAcc)
+
+            stop = bound is not None and bound.update(acumAcc, batch)
+            evalProgressUpdate.update(acumAcc, batch, force=stop)   #chart ends where it stopped
+            if stop:
+                break
+            batch += 1
+
+        return lossSum / end, acumAcc, accHist
+
+
 ########################
 #      Callbacks       #
 ########################
@@ -53,13 +182,21 @@ class EvalProgressUpdateCB(keras.callbacks.Callback):
     Generate evaluation progress
 
     update accList with the accuracy of each batch
+    stop evaluating if bound shows the model cannot improve its score
     '''
-    def __init__(self, accList:List[float], evalProg:EvaluationProgess, batches:int, rank:ScoreRank, params:int) -> None:
+    def __init__(self, accList:List[float], evalProg:EvaluationProgess, batches:int, rank:ScoreRank, params:int,
+                 bound:EvalBound=None) -> None:
+        super().__init__()
         self._accList = accList
         self._evalProgressUpdate = EvalProgressUpdate(evalProg, batches, rank, params)
+        self._bound = bound
 
     def on_test_batch_end(self, batch, logs=None):
         curAcc = logs["accuracy"]
         self._accList.append(curAcc)
 
-        self._evalProgressUpdate.update(curAcc, batch)
+        #logs accuracy is the running mean over all evaluated samples
+        stop = self._bound is not None and self._bound.update(curAcc, batch)
+        self._evalProgressUpdate.update(curAcc, batch, force=stop)  #chart ends where it stopped
+        if stop:
+            self.model.stop_evaluating = True
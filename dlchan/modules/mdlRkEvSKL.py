@@ -12,20 +12,28 @@ from modules.evalprog import EvaluationProgess
 from modules.evalprogupdate import EvalProgressUpdate
 #from modules.modelSKL import ModelSKL
 from modelSKL import ModelSKL
+from datasetutil import DatasetUtil
 from modules.mdlrankeval import ModelRankEval
 from modules.score import ScoreRank
+from modules.evalbound import EvalBound
 
 
 class ModelRkEvSKL(ModelSKL, ModelRankEval):
     
     def _rawRankEval(self, X:NDArray, y:NDArray) -> Tuple[float, float]:   
-        yc  = self._toCategorical(y)
+        yc  = DatasetUtil.toCategorical(y)
         acc = self._model.score(X, yc)
         return 0, acc
 
 
+    def predictBatches(self, X:NDArray, batchSize:int) -> None:
+        for start in range(0, X.shape[0], batchSize):
+            self._model.predict(X[start:start+batchSize])
+
+
     def _rankEval(self, X:NDArray, y:NDArray, evalProg:EvaluationProgess, 
-                 rank:ScoreRank, batches:int, batchSize:int) -> Tuple[float,float,List[float]]:
+                 rank:ScoreRank, batches:int, batchSize:int,
+                 bound:EvalBound=None) -> Tuple[float,float,List[float]]:
         '''
         Subclass dependant evaluation part
         '''
@@ -56,8 +64,13 @@ class ModelRkEvSKL(ModelSKL, ModelRankEval):
             #Append to accuracy history
             accHist.append(acumMean)
 
+            #Stop if model cannot improve its score, its last batch is published
+            stop = bound is not None and bound.update(acumMean, batch)
+
             #Update evaluation progress
-            evalProgressUpdate.update(acumMean, batch)
+            evalProgressUpdate.update(acumMean, batch, force=stop)
+            if stop:
+                break
             batch += 1
     
         acc = acumMean
@@ -12,19 +12,50 @@ from modules.evalprog import EvaluationProgess
 #from modules.model import Model
 from model import Model
 from modules.score import ScoreRank
+from modules.evalbound import EvalBound
 
 
 class ModelRankEval(Model):
 
+    @abstractmethod
+    def _rawRankEval(self, X:NDArray, y:NDArray) -> Tuple[float, float]:
+        pass # not needed for @abstractmethod: raise NotImplementedError
+
+
     @abstractmethod
     def _rankEval(self, X:NDArray, y:NDArray, evalProg:EvaluationProgess, 
-                 rank:ScoreRank, batches:int, batchSize:int=32) -> Tuple[float,float,List[float]]:
+                 rank:ScoreRank, batches:int, batchSize:int=32,
+                 bound:EvalBound=None) -> Tuple[float,float,List[float]]:
         pass # not needed for @abstractmethod: raise NotImplementedError
     
     
+    @abstractmethod
+    def predictBatches(self, X:NDArray, batchSize:int) -> None:
+        '''predict X by batches of batchSize, as the evaluation does, to time it'''
+        pass # not needed for @abstractmethod: raise NotImplementedError
+
+
+    def quickEval(self, X:NDArray, y:NDArray) -> Tuple[float,float]:
+        '''
+        (loss, accuracy) of (X, y) in a single pass, without progress updates
+        acc = -1 signal an error
+        '''
+        if self._model is not None:
+            try:
+                return self._rawRankEval(X, y)
+            except:
+                pass
+        return (0, -1)
+
+
     def rankEval(self, X:NDArray, y:NDArray, evalProg:EvaluationProgess, 
                  rank:ScoreRank, batches:int, batchSize:int=32, 
-                 shuffle:bool=False, seed:int=None) -> Tuple[float,float,List[float]]:
+                 shuffle:bool=False, seed:int=None,
+                 bound:EvalBound=None) -> Tuple[float,float,List[float]]:
+        '''
+        If bound is given, the evaluation stops as soon as the model cannot
+        improve its score table entry, then bound.stopped is True
+        '''
         if self._model is not None:
 
             #shuffle different each time before evaluate
@@ -53,7 +84,7 @@ class ModelRankEval(Model):
                 yr = y
 
             try:
-                (loss, acc, accHist) = self._rankEval(Xr, yr, evalProg, rank, batches, batchSize)
+                (loss, acc, accHist) = self._rankEval(Xr, yr, evalProg, rank, batches, batchSize, bound)
                 return (loss, acc, accHist)
             except:
                 return (0, -1, [])   #acc = -1 signal an error todo: find a better way
@@ -0,0 +1,151 @@
+#Timing metrics for ML/DL run challenge web app
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import *
+from modules.flasklog import FlaskLog
+
+
+class Summary:
+    '''
+    Count, sum and the last samples of a timing, to compute quantiles when exported
+    '''
+    def __init__(self, window:int) -> None:
+        self.count   : int   = 0
+        self.sum     : float = 0.0
+        self.samples : Deque[float] = deque(maxlen=window)
+
+    def observe(self, value:float) -> None:
+        self.count += 1
+        self.sum   += value
+        self.samples.append(value)
+
+    def quantiles(self, qs:Tuple[float, ...]) -> List[float]:
+        s = sorted(self.samples)
+        if len(s) == 0:
+            return [float('nan')] * len(qs)
+        return [s[min(int(q*len(s)), len(s)-1)] for q in qs]
+
+
+class Metrics:
+    '''
+    In process timing spans and counters, exported in Prometheus text format.
+    Recording is a perf_counter() pair and a deque append, cheap enough to leave on.
+
+    Note: each server process has its own metrics, the evaluator stages
+    are only recorded in the process running the Evaluator
+    '''
+
+    prefix    = 'dlchan'
+    window    = 1024                 # samples kept per timing to compute quantiles
+    quantiles = (0.5, 0.95, 0.99)
+
+    _lock      = threading.Lock()
+    _summaries : Dict[Tuple[str, str, str], Summary] = {}   # (metric, label, value): Summary
+    _counters  : Dict[str, float] = {}
+    _gauges    : Dict[str, float] = {}
+    _help      : Dict[str, str] = {
+        'stage_seconds'         : 'Duration of evaluation pipeline stages',
+        'route_seconds'         : 'Duration of web route handlers',
+        'eval_samples_total'    : 'Samples evaluated',
+        'eval_seconds_total'    : 'Time spent in inference',
+        'eval_samples_per_second': 'Inference throughput of the last evaluation',
+        'queue_coalesced_total' : 'Waiting models of the same tag replaced by an upload',
+        'early_stop_saved_seconds_total': 'Estimated inference time saved by early stopped evaluations',
+        'eval_killed_total'     : 'Evaluations stopped by the watchdog: timeout, CPU or memory limits',
+        'eval_batch_size'       : 'Batch size chosen for the last evaluated model',
+        'eval_probe_samples_per_second': 'Probe throughput of the chosen batch size',
+    }
+
+
+    @classmethod
+    def observe(cls, metric:str, label:str, value:str, seconds:float) -> None:
+        key = (metric, label, value)
+        with cls._lock:
+            summary = cls._summaries.get(key)
+            if summary is None:
+                summary = cls._summaries[key] = Summary(cls.window)
+            summary.observe(seconds)
+        if metric == 'stage_seconds':
+            FlaskLog.stage(value, seconds)
+
+
+    @classmethod
+    @contextmanager
+    def span(cls, stage:str) -> Iterator[None]:
+        '''time an evaluation stage: with Metrics.span('inference'): ...'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe('stage_seconds', 'stage', stage, time.perf_counter()-start)
+
+
+    @classmethod
+    def route(cls, rule:str, seconds:float) -> None:
+        cls.observe('route_seconds', 'route', rule, seconds)
+
+
+    @classmethod
+    def inc(cls, counter:str, value:float=1) -> None:
+        with cls._lock:
+            cls._counters[counter] = cls._counters.get(counter, 0) + value
+
+
+    @classmethod
+    def set(cls, gauge:str, value:float) -> None:
+        cls._gauges[gauge] = value
+
+
+    @classmethod
+    def throughput(cls, samples:int, seconds:float) -> None:
+        '''register samples evaluated in seconds of inference'''
+        cls.inc('eval_samples_total', samples)
+        cls.inc('eval_seconds_total', seconds)
+        if seconds > 0:
+            cls.set('eval_samples_per_second', samples/seconds)
+
+
+    @classmethod
+    def prometheus(cls) -> str:
+        '''all metrics in Prometheus text exposition format'''
+        with cls._lock:
+            summaries = [(k, s.count, s.sum, s.quantiles(cls.quantiles))
+                         for k, s in sorted(cls._summaries.items())]
+            counters  = sorted(cls._counters.items())
+        gauges = sorted(cls._gauges.items())
+
+        out = []
+        last = None
+        for (metric, label, value), count, total, qs in summaries:
+            name = f'{cls.prefix}_{metric}'
+            if metric != last:
+                out.append(f'# HELP {name} {cls._help.get(metric, metric)}')
+                out.append(f'# TYPE {name} summary')
+                last = metric
+            for q, v in zip(cls.quantiles, qs):
+                out.append(f'{name}{{{label}="{value}",quantile="{q}"}} {v:.6g}')
+            out.append(f'{name}_sum{{{label}="{value}"}} {total:.6g}')
+            out.append(f'{name}_count{{{label}="{value}"}} {count}')
+
+        for kind, items in (('counter', counters), ('gauge', gauges)):
+            for metric, v in items:
+                name = f'{cls.prefix}_{metric}'
+                out.append(f'# HELP {name} {cls._help.get(metric, metric)}')
+                out.append(f'# TYPE {name} {kind}')
+                out.append(f'{name} {v:.6g}')
+
+        return '\n'.join(out) + '\n'
+
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._summaries.clear()
+            cls._counters.clear()
+        cls._gauges.clear()
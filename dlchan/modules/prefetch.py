@@ -0,0 +1,141 @@
+#Model prefetcher for ML/DL run challenge
+#Loads the next models in RUNQUEUE while the current one is evaluated
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import os, threading
+from typing import *
+from numpy.typing import NDArray
+#from modules.model import Model
+from model import Model
+#from modules.modelsel import ModelSelect
+from modelsel   import ModelSelect
+from modules.runqueue import RunQueue
+from modules.flasklog import FlaskLog
+
+
+class Prefetched(NamedTuple):
+    '''Model loaded and dataset shaped for its input layer, ready to evaluate'''
+    stamp  : Tuple[int, int]                    # file (mtime, size) when loaded
+    model  : Model
+    data   : Optional[Tuple[NDArray, NDArray]]  # None if the model input is not 1D or 2D
+    nbytes : int
+
+
+class ModelPrefetcher:
+    '''
+    Background stage of the evaluation pipeline:
+    peeks at RUNQUEUE, loads the waiting models and shapes the dataset for them.
+    The memory held by prefetched models and datasets is bounded by budget bytes.
+
+    The Evaluator takes a prefetched entry when it gets the model from RUNQUEUE,
+    if the file was overwritten (re-uploaded) since it was loaded, the entry is discarded.
+    If the model is being loaded when taken, as the head of an empty queue is,
+    take() waits for that load instead of loading it again.
+    '''
+
+    def __init__(self, runQueue:RunQueue, modelSel:ModelSelect, uploadFolder:str,
+                 shape:Callable[[Model, str], Optional[Tuple[NDArray, NDArray]]],
+                 datasetBytes:int, budget:int) -> None:
+        self._runQueue     = runQueue
+        self._modelSel     = modelSel
+        self._uploadFolder = uploadFolder
+        self._shape        = shape
+        self._datasetBytes = datasetBytes   # shaped dataset size estimate before loading
+        self._budget       = budget
+        self._lock         = threading.Lock()
+        self._loaded       = threading.Condition(self._lock)   # notified when a load ends
+        self._loading      : Optional[str] = None               # file being loaded
+        self._entries      : Dict[str, Prefetched] = {}
+        self._missing      : Set[str] = set()
+        self._wake         = runQueue.subscribe()
+
+
+    def start(self) -> None:
+        threading.Thread(target=self._prefetchThread, daemon=True).start()
+
+
+    def kick(self) -> None:
+        '''re-check RUNQUEUE: a model was taken or memory was freed'''
+        self._wake.set()
+
+
+    def take(self, filename:str) -> Optional[Prefetched]:
+        with self._lock:
+            while self._loading == filename:
+                self._loaded.wait()
+            entry = self._entries.pop(filename, None)
+            self._missing.discard(filename)
+        self.kick()
+        if entry is not None and entry.stamp != self._stamp(filename):
+            FlaskLog.warning(f'prefetched model was replaced: {filename}')
+            return None
+        return entry
+
+
+    def _used(self) -> int:
+        with self._lock:
+            return sum(e.nbytes for e in self._entries.values())
+
+
+    def _stamp(self, filename:str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(os.path.join(self._uploadFolder, filename))
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+
+    def _prefetchThread(self) -> None:
+        while True:
+            self._wake.wait(timeout=1)
+            self._wake.clear()
+
+            waiting = self._runQueue.waiting()
+
+            #forget models no longer queued (cleared or replaced) in two checks in a row,
+            #the Evaluator may have just got one from RUNQUEUE and be about to take it
+            with self._lock:
+                for filename in list(self._entries):
+                    if filename in waiting:
+                        self._missing.discard(filename)
+                    elif filename in self._missing:
+                        del self._entries[filename]
+                        self._missing.discard(filename)
+                    else:
+                        self._missing.add(filename)
+
+            for filename in waiting:
+                stamp = self._stamp(filename)
+                if stamp is None:
+                    continue
+                with self._lock:
+                    entry = self._entries.get(filename)
+                    if entry is not None:
+                        if entry.stamp == stamp:
+                            continue
+                        del self._entries[filename]     #re-uploaded: load it again
+                if self._used() + stamp[1] + self._datasetBytes > self._budget:
+                    break   #keep queue order: do not skip to smaller models
+
+                with self._lock:
+                    self._loading = filename
+                entry = None
+                try:
+                    model = self._modelSel.fromFile(os.path.join(self._uploadFolder, filename))
+                    if model is not None:   #else Evaluator reports it
+                        data   = self._shape(model, filename.rsplit('.', 1)[0])
+                        nbytes = stamp[1] + (data[0].nbytes + data[1].nbytes if data is not None else 0)
+                        entry  = Prefetched(stamp, model, data, nbytes)
+                except Exception as e:
+                    FlaskLog.warning(f'prefetch failed for {filename}: {e}')
+                finally:
+                    with self._lock:
+                        if entry is not None:
+                            self._entries[filename] = entry
+                        self._loading = None
+                        self._loaded.notify_all()
+                if entry is not None:
+                    FlaskLog.warning(f'prefetched model: {filename}')
@@ -0,0 +1,163 @@
+#Run queue scheduling policies for ML/DL run challenge
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import os, statistics
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import *
+from modules.evalhist import EvalHist
+
+
+class JobEstimator:
+    '''
+    Estimated evaluation seconds of a waiting model, from the evaluation history:
+        the model cost by input value times the median seconds per cost unit
+        of previous evaluations of the same cost family (Model.costFamily), or
+        the median duration of previous evaluations of the same tag
+    None if there is no history for it
+    '''
+
+    def __init__(self, evalHist:EvalHist) -> None:
+        self._evalHist = evalHist
+
+
+    def estimate(self, filename:str, cost:Optional[float], kind:Optional[str]) -> Optional[float]:
+        if self._evalHist is None:
+            return None
+        rates = self._evalHist.rates().get(kind)
+        if cost is not None and rates:
+            return cost * statistics.median(rates)
+        past = self._evalHist.durations().get(QueuePolicy.tag(filename))
+        if past:
+            return statistics.median(past)
+        return None
+
+
+    def etas(self, queue:List[Tuple[str, datetime, Optional[float], Optional[str]]]) -> List[Optional[float]]:
+        '''
+        seconds until each entry of an ordered queue starts, after the running model
+        None from the first entry without estimate on
+        '''
+        etas, total = [], 0.0
+        for filename, date, cost, kind in queue:
+            etas.append(total)
+            if total is not None:
+                seconds = self.estimate(filename, cost, kind)
+                total   = total + seconds if seconds is not None else None
+        return etas
+
+
+
+class QueuePolicy(ABC):
+    '''
+    Order in which the models waiting in RUNQUEUE are evaluated
+    The queue is a list of (model filename, date added, cost, cost family) in arrival order
+
+    keepPlace: a new upload of a waiting tag takes the place and date of the waiting entry,
+    else it goes to the end of the queue with its upload date
+    '''
+
+    keepPlace = True
+
+    @abstractmethod
+    def order(self, queue:List[Tuple[str, datetime, Optional[float], Optional[str]]]) -> List[int]:
+        '''indexes of queue entries in evaluation order'''
+        pass # not needed for @abstractmethod: raise NotImplementedError
+
+
+    @staticmethod
+    def tag(filename:str) -> str:
+        return filename.rsplit('.', 1)[0]
+
+
+    @classmethod
+    def fromName(cls, name:str, uploadFolder:str=None, evalHist:EvalHist=None,
+                      maxWait:float=600) -> 'QueuePolicy':
+        '''policy from dlchan.cfg queuePolicy: "fifo", "fair" or "sjf"'''
+        if name == 'fifo':  return FifoPolicy()
+        if name == 'fair':  return FairSharePolicy()
+        if name == 'sjf':   return ShortestJobPolicy(uploadFolder, evalHist, maxWait)
+        raise ValueError(f'unknown queue policy: {name}')
+
+
+
+class FifoPolicy(QueuePolicy):
+    '''First uploaded, first evaluated'''
+
+    def order(self, queue:List[Tuple[str, datetime, Optional[float], Optional[str]]]) -> List[int]:
+        return list(range(len(queue)))
+
+
+
+class FairSharePolicy(QueuePolicy):
+    '''
+    Round robin across tags: the first waiting model of every tag goes before
+    the second of any tag, and so on. Ties in arrival order.
+    A series of uploads with the same tag does not hold the others.
+    A re-upload goes to the end: it does not keep the turn of the previous one.
+    '''
+
+    keepPlace = False
+
+    def order(self, queue:List[Tuple[str, datetime, Optional[float], Optional[str]]]) -> List[int]:
+        seen : Dict[str, int] = {}
+        turn = []
+        for i, entry in enumerate(queue):
+            tag = self.tag(entry[0])
+            turn.append(seen.get(tag, 0))
+            seen[tag] = turn[-1] + 1
+        return sorted(range(len(queue)), key=lambda i: (turn[i], i))
+
+
+
+class ShortestJobPolicy(QueuePolicy):
+    '''
+    Estimated shortest job first. The evaluation time is estimated by JobEstimator,
+    from the model cost or previous evaluations of the same tag, else from
+    the model file size times the median seconds per byte of previous evaluations,
+    all from the evaluation history, so every server process orders the queue the same
+
+    Models waiting more than maxWait seconds go first, in arrival order,
+    so long jobs are not postponed forever. A re-upload waits again from its upload date
+    '''
+
+    keepPlace = False
+
+    def __init__(self, uploadFolder:str, evalHist:EvalHist, maxWait:float=600) -> None:
+        self._uploadFolder = uploadFolder
+        self._evalHist     = evalHist
+        self._estimator    = JobEstimator(evalHist)
+        self._maxWait      = maxWait
+
+
+    def estimate(self, filename:str, cost:Optional[float]=None, kind:Optional[str]=None) -> float:
+        '''estimated evaluation seconds'''
+        seconds = self._estimator.estimate(filename, cost, kind)
+        if seconds is not None:
+            return seconds
+
+        size = self._size(filename)
+        byteRates = self._evalHist.secondsPerByte() if self._evalHist is not None else []
+        if len(byteRates) > 0:
+            return size * statistics.median(byteRates)
+        return size * 1e-6   #no history: order by size
+
+
+    def order(self, queue:List[Tuple[str, datetime, Optional[float], Optional[str]]]) -> List[int]:
+        now = datetime.now()
+        def key(i:int) -> Tuple[int, float, int]:
+            filename, date, cost, kind = queue[i]
+            if (now - date).total_seconds() > self._maxWait:
+                return (0, 0, i)
+            return (1, self.estimate(filename, cost, kind), i)
+        return sorted(range(len(queue)), key=key)
+
+
+    def _size(self, filename:str) -> int:
+        try:
+            return os.path.getsize(os.path.join(self._uploadFolder, filename))
+        except (OSError, TypeError):
+            return 0
@@ -1,22 +1,36 @@
 #Run queue for submited modules, for ML/DL run challenge
 #
-#v0.1 Aug 2022, v0.2 Nov 2024
+#v0.1 Aug 2022, v0.2 Nov 2024, v0.3 oct 2026
 #hdaniel@ualg.pt
 #
 
 from datetime import datetime
 from operator import mod
-import pickle
+import pickle, os, socket, threading
 from filelock import FileLock
 from typing import *
 from modules.flasklog import FlaskLog
+from modules.queuepolicy import QueuePolicy, FifoPolicy
 
 
 class RunQueue:
+    '''
+    Queue of uploaded model files waiting for evaluation, shared by processes in a pickle file
+    Entries are (model filename, date added, cost by input value or None, cost family or None)
+    '''
 
-    def __init__(self, queueFN:str, lock:FileLock) -> None:
+    def __init__(self, queueFN:str, lock:FileLock, notifyFN:str=None,
+                 policy:QueuePolicy=None) -> None:
         self.__queueFN = queueFN
         self.__lock = lock
+        self.__policy = policy if policy is not None else FifoPolicy()
+
+        #wake up evaluators waiting for models:
+        #in process with a condition, across processes with a datagram to notifyFN socket
+        self.__notifyFN = notifyFN
+        self.__cond     = threading.Condition()
+        self.__added    = False
+        self.__events   : List[threading.Event] = []
 
         #read it or create it if does not exist
         try:
@@ -43,6 +57,70 @@ class RunQueue:
             pickle.dump(self.__queue, f)
 
 
+    ######################################
+    #       evaluator notification       #
+    ######################################
+    def __notify(self) -> None:
+        with self.__cond:
+            self.__added = True
+            self.__cond.notify_all()
+            for e in self.__events:
+                e.set()
+
+
+    def subscribe(self) -> threading.Event:
+        '''event set each time a model is added, for other stages than the Evaluator'''
+        e = threading.Event()
+        with self.__cond:
+            self.__events.append(e)
+        return e
+
+
+    def __notifyProcesses(self) -> None:
+        '''send datagram to evaluator process, if it is not listening ignore it'''
+        if self.__notifyFN is None:
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+                s.setblocking(False)
+                s.sendto(b'+', self.__notifyFN)
+        except OSError:
+            pass    #no listener or already full of notifications
+
+
+    def listen(self) -> None:
+        '''
+        Receive notifications of models added by other processes
+        Called by the process that runs the Evaluator
+        '''
+        if self.__notifyFN is None:
+            return
+        try:
+            os.remove(self.__notifyFN)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.__notifyFN)
+
+        def receiver():
+            while True:
+                sock.recv(64)
+                self.__notify()
+
+        threading.Thread(target=receiver, daemon=True).start()
+
+
+    def wait(self, timeout:float) -> bool:
+        '''
+        Block until a model is added or timeout seconds
+        returns True if a model was added since the last call
+        '''
+        with self.__cond:
+            added = self.__cond.wait_for(lambda: self.__added, timeout)
+            self.__added = False
+            return added
+
+
     ############################
     #   public score access    #
     ############################
@@ -56,48 +134,73 @@ class RunQueue:
             self.__write()
 
 
-    def get(self) -> Optional[str|None]:
+    def get(self, date:bool=False) -> Optional[str|Tuple[str, datetime]|None]:
         '''
-        Atomic get and remove first from queue
+        Atomic get and remove first from queue, first in the queue policy order
+        if date is True returns (modelFN, date added to queue)
         '''
         with self.__lock:
-            return self.__unlockedGet()
+            return self.__unlockedGet(date)
 
 
-    def __unlockedGet(self) -> Optional[str|None]:
+    def __unlockedGet(self, date:bool) -> Optional[str|Tuple[str, datetime]|None]:
         '''
         Get and remove first from queue
         '''
         self.__read()
-        modelFN = None
+        entry = None
         if len(self.__queue) > 0:
-            modelFN, date = self.__queue.pop(0)
+            entry = self.__queue.pop(self.__policy.order(self.__queue)[0])
             self.__write()
-        
-        return modelFN
+
+        if entry is None:
+            return entry
+        if date:
+            return entry[0], entry[1]
+        return entry[0]
 
     
-    def add(self, modelFN:str) -> None:
+    def add(self, modelFN:str, cost:float=None, kind:str=None) -> List[str]:
         '''
         Atomic add to end of queue
+        cost is the model static cost estimate by input value, to estimate the wait,
+        kind its Model.costFamily()
+        Waiting entries of the same tag are superseded by this one, that keeps the place
+        and date of the first of them if the queue policy keepPlace, else goes to the end
+        returns the superseded model filenames, empty if none was waiting
         '''
         with self.__lock:
-            self.__unlockedAdd(modelFN)
+            superseded = self.__unlockedAdd(modelFN, cost, kind)
+        if len(superseded) == 0 or not self.__policy.keepPlace:
+            self.__notify()
+            self.__notifyProcesses()
+        return superseded
 
     
-    def __unlockedAdd(self, modelFN:str) -> None:
+    def __unlockedAdd(self, modelFN:str, cost:float, kind:str) -> List[str]:
         '''
-        Add to end of queue
+        Add to end of queue, replacing waiting entries of the same tag
         '''
         self.__read()
-        date = datetime.now()
-        self.__queue.append((modelFN, date))
+        tag  = QueuePolicy.tag(modelFN)
+        same = [i for i, entry in enumerate(self.__queue) if QueuePolicy.tag(entry[0]) == tag]
+        superseded = [self.__queue[i][0] for i in same]
+
+        entry = (modelFN, datetime.now(), cost, kind)
+        if len(same) > 0 and self.__policy.keepPlace:
+            #place and date of the first one, cost of the new model
+            self.__queue[same[0]] = (modelFN, self.__queue[same[0]][1], cost, kind)
+            same, entry = same[1:], None
+        self.__queue = [e for i, e in enumerate(self.__queue) if i not in same]
+        if entry is not None:
+            self.__queue.append(entry)
         self.__write()
+        return superseded
 
 
     def waiting(self, date:bool=False) -> List[str]:
         '''
-        return list of waiting models
+        return list of waiting models, in the order they will be evaluated
         operation is atomic
         '''
         with self.__lock:
@@ -108,9 +211,21 @@ class RunQueue:
         '''
         return list of waiting models
         '''
-        self.__read()
+        queue = self.__unlockedPending()
         if date:
-            queue = self.__queue
-        else:
-            queue = [modelFN for modelFN, date in self.__queue]
-        return queue
\ No newline at end of file
+            return [(entry[0], entry[1]) for entry in queue]
+        return [entry[0] for entry in queue]
+
+
+    def pending(self) -> List[Tuple[str, datetime, Optional[float], Optional[str]]]:
+        '''
+        return list of waiting (modelFN, date added, cost, kind), in the order they will be evaluated
+        operation is atomic
+        '''
+        with self.__lock:
+            return self.__unlockedPending()
+
+
+    def __unlockedPending(self) -> List[Tuple[str, datetime, Optional[float], Optional[str]]]:
+        self.__read()
+        return [self.__queue[i] for i in self.__policy.order(self.__queue)]
\ No newline at end of file
@@ -1,23 +1,40 @@
 #Score table for ML/DL run challenge
 #
-#v0.1 jul 2022, 0.2 Nov 2024
+#v0.1 jul 2022, 0.2 Nov 2024, 0.3 oct 2026
 #hdaniel@ualg.pt
 #
 
 from datetime import datetime
-import pickle, os
+import pickle, os, json
 from filelock import FileLock
 from typing import *
 import numpy as np
 
 
 class ScoreTable:
+    '''
+    Score table: tag: [acc (%), loss, params, date], sorted by accuracy and params,
+    and the accuracy history of the top runner.
+
+    The top history is kept as float32 x-axis (0-100) and accuracy (%) arrays
+    in raw bytes, downsampled with LTTB to histPoints, and its JSON
+    is built once, when it changes, for the running chart
+    '''
+
+    histPoints = 100    # top history points, running.html has 100 x-axis labels, 0 all batches
+
+    @classmethod
+    def setup(cls, histPoints:int) -> None:
+        cls.histPoints = histPoints
+
 
     def __init__(self, tableFN:str, lock:FileLock) -> None:
         self._tableFN = tableFN
         self._lock = lock
         self._table = {}
-        self._topHist = []
+        self._topHist = b''                 # float32 x then y, raw bytes
+        self._topHistJson = '[]'            # [[x, y], ...] of _topHist
+        self._topHistJsonOf = b''           # _topHist bytes of _topHistJson
         self._updateDate  = datetime.now()  #Not needed filled by __read() or __write()
 
         #read it or create it if does not exist
@@ -38,6 +55,7 @@ class ScoreTable:
     ############################
 
     def top(self): 
+        '''[top tag, top history JSON fragment, top entry]'''
         self.__read() 
         if len(self._table) > 0:
             name = list(self._table.keys())  [0]
@@ -45,7 +63,56 @@ class ScoreTable:
         else:
             name = ''
             val  = ''
-        return [name, self._topHist, val]
+        return [name, self.topHistJson(), val]
+
+
+    def topHistJson(self) -> str:
+        '''top history as a JSON list of [x, acc] points, rebuilt only when it changes'''
+        if self._topHist != self._topHistJsonOf:
+            x, y = self.unpackHist(self._topHist)
+            self._topHistJson = json.dumps([[round(float(a), 3), round(float(b), 5)] for a, b in zip(x, y)],
+                                           separators=(',', ':'))
+            self._topHistJsonOf = self._topHist
+        return self._topHistJson
+
+
+    @classmethod
+    def packHist(cls, x:np.ndarray, y:np.ndarray) -> bytes:
+        '''downsample (x, y) to histPoints and pack as float32 x then y bytes'''
+        if cls.histPoints > 0:
+            x, y = cls.lttb(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), cls.histPoints)
+        return np.asarray(x, dtype=np.float32).tobytes() + np.asarray(y, dtype=np.float32).tobytes()
+
+
+    @staticmethod
+    def unpackHist(hist:bytes) -> Tuple[np.ndarray, np.ndarray]:
+        xy = np.frombuffer(hist, dtype=np.float32)
+        n  = len(xy)//2
+        return xy[:n], xy[n:]
+
+
+    @staticmethod
+    def lttb(x:np.ndarray, y:np.ndarray, points:int) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Largest triangle three buckets downsampling: keeps the first and last points
+        and, from each of points-2 buckets, the point of largest triangle with
+        the previous kept point and the mean of the next bucket, so peaks and dips stay
+        '''
+        n = len(x)
+        if points >= n or points < 3:
+            return x, y
+        edges = np.linspace(1, n-1, points-1).astype(int)  # points-2 buckets in [1, n-1)
+        idx = np.empty(points, dtype=int)
+        idx[0], idx[-1] = 0, n-1
+        a = 0
+        for i in range(points-2):
+            start, end = edges[i], edges[i+1]
+            nextStart, nextEnd = (edges[i+1], edges[i+2]) if i+2 < len(edges) else (n-1, n)
+            cx, cy = x[nextStart:nextEnd].mean(), y[nextStart:nextEnd].mean()
+            area = np.abs((x[a]-cx)*(y[start:end]-y[a]) - (x[a]-x[start:end])*(cy-y[a]))
+            a = start + int(np.argmax(area))
+            idx[i+1] = a
+        return x[idx], y[idx]
     
 
     def update(self, tag:str, acc:float, loss:float, param:int, accHist:List[float]) -> bool:
@@ -88,11 +155,11 @@ class ScoreTable:
 
             if list(self._table.keys())[0] == tag:  
                 #Convert top history accuracy to percentage [0-100]
-                topHist = [i*100 for i in accHist]
+                topHist = np.asarray(accHist, dtype=np.float64)*100
 
                 #rescale top history x-axis to [0-100]
                 x = np.linspace(0, 100, len(topHist))
-                self._topHist = [(x,y) for x,y in zip(x,topHist)]
+                self._topHist = self.packHist(x, topHist)
 
             self._updateDate = datetime.now()
             self.__unlockedWrite()
@@ -162,6 +229,15 @@ class ScoreTable:
             return -1
         
 
+    def findAccByTag(self, tag:str) -> Optional[float]:
+        '''
+        return accuracy (percentage) of tag in score table, None if not present
+        '''
+        self.__read()
+        entry = self._table.get(tag)
+        return entry[0] if entry is not None else None
+
+
     def updateDate(self) -> datetime:
         '''
         return update date
@@ -191,6 +267,11 @@ class ScoreTable:
             self._topHist    = pickle.load(f)
             self._table      = pickle.load(f)
 
+        #tables written before: list of (x, acc) tuples
+        if isinstance(self._topHist, list):
+            xy = np.array(self._topHist, dtype=np.float64).reshape(-1, 2)
+            self._topHist = self.packHist(xy[:, 0], xy[:, 1])
+
 
     def __write(self) -> None:
         '''write table with file lock'''
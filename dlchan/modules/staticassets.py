@@ -0,0 +1,128 @@
+#Static assets and compressed responses for ML/DL run challenge web app
+#
+#v0.1 oct 2026
+#hdaniel@ualg.pt
+#
+
+import gzip, hashlib, mimetypes, os
+from typing import *
+from flask import Flask, Response, request, send_from_directory
+
+
+class StaticAssets:
+    '''
+    Static files:
+        url_for('static', filename=f) adds ?v=<content hash>, and those URLs are
+        sent with Cache-Control immutable: a changed file gets a new URL
+        f.gz, precompressed by buildStatic.py, is sent if the browser accepts gzip
+    JSON responses of at least minSize bytes are gzipped on the fly
+    '''
+
+    minSize = 1024      # smallest JSON body to compress, 0 disables
+    level   = 5         # gzip level on the fly, speed over size
+    maxAge  = 31536000  # fingerprinted static files, seconds
+
+    #already compressed formats are not precompressed
+    compressible = ('.js', '.css', '.html', '.svg', '.json', '.txt', '.map')
+
+    @classmethod
+    def setup(cls, app:Flask, minSize:int, level:int, maxAge:int) -> None:
+        cls.minSize = minSize
+        cls.level   = level
+        cls.maxAge  = maxAge
+        folder  = app.static_folder
+        hashes  = cls.fingerprints(folder)
+        #precompressed files, if not older than their source
+        gzipped = {fn for fn in hashes if fn + '.gz' in hashes and
+                   os.path.getmtime(os.path.join(folder, fn + '.gz')) >= os.path.getmtime(os.path.join(folder, fn))}
+
+        @app.url_defaults
+        def fingerprint(endpoint:str, values:Dict) -> None:
+            if endpoint == 'static' and 'filename' in values:
+                v = hashes.get(values['filename'])
+                if v is not None:
+                    values['v'] = v
+
+        def static(filename:str) -> Response:
+            if filename in gzipped and cls.accepts(request.headers.get('Accept-Encoding', '')):
+                response = send_from_directory(folder, filename + '.gz',
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.headers['Content-Encoding'] = 'gzip'
+            else:
+                response = send_from_directory(folder, filename)
+            if filename in gzipped:
+                response.vary.add('Accept-Encoding')
+            if request.args.get('v') is not None and request.args.get('v') == hashes.get(filename):
+                response.headers['Cache-Control'] = f'public, max-age={cls.maxAge}, immutable'
+            return response
+
+        app.view_functions['static'] = static
+
+        @app.after_request
+        def compressJson(response:Response) -> Response:
+            if response.mimetype != 'application/json' or response.direct_passthrough or \
+               'Content-Encoding' in response.headers:
+                return response
+            body = cls.compress(response.get_data(), request.headers.get('Accept-Encoding', ''))
+            if body is not None:
+                response.set_data(body)
+                response.headers['Content-Encoding'] = 'gzip'
+                response.vary.add('Accept-Encoding')
+            return response
+
+
+    @staticmethod
+    def fingerprints(folder:str) -> Dict[str, str]:
+        '''static file path relative to folder: first 12 hex digits of its sha256'''
+        hashes = {}
+        for root, dirs, files in os.walk(folder):
+            for name in files:
+                fn = os.path.join(root, name)
+                with open(fn, 'rb') as f:
+                    hashes[os.path.relpath(fn, folder).replace(os.sep, '/')] = hashlib.sha256(f.read()).hexdigest()[:12]
+        return hashes
+
+
+    @staticmethod
+    def accepts(acceptEncoding:str) -> bool:
+        '''True if Accept-Encoding allows gzip'''
+        for coding in acceptEncoding.split(','):
+            name, _, q = coding.partition(';')
+            if name.strip() in ('gzip', '*'):
+                try:
+                    return float(q.split('=')[1]) > 0 if '=' in q else True
+                except ValueError:
+                    return False
+        return False
+
+
+    @classmethod
+    def compress(cls, body:bytes, acceptEncoding:str) -> Optional[bytes]:
+        '''gzipped body if it is large enough and gzip is accepted, else None'''
+        if cls.minSize <= 0 or len(body) < cls.minSize or not cls.accepts(acceptEncoding):
+            return None
+        return gzip.compress(body, compresslevel=cls.level, mtime=0)
+
+
+    @classmethod
+    def build(cls, folder:str) -> List[Tuple[str, int, int]]:
+        '''
+        write f.gz next to each compressible static file, if smaller
+        returns [(file, size, gzip size)] of the written ones
+        '''
+        written = []
+        for root, dirs, files in os.walk(folder):
+            for name in files:
+                if not name.endswith(cls.compressible):
+                    continue
+                fn = os.path.join(root, name)
+                with open(fn, 'rb') as f:
+                    data = f.read()
+                gz = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(gz) < len(data):
+                    with open(fn + '.gz', 'wb') as f:
+                        f.write(gz)
+                    written.append((os.path.relpath(fn, folder), len(data), len(gz)))
+                elif os.path.exists(fn + '.gz'):
+                    os.remove(fn + '.gz')
+        return written
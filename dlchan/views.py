@@ -5,7 +5,7 @@
 #
 
 from datetime import datetime, timedelta
-from flask import Flask, Response, render_template, request, send_from_directory, send_file, jsonify
+from flask import Flask, Response, render_template, request, send_from_directory, send_file, jsonify, g
 from werkzeug.utils import secure_filename
 import os, time
 from modules.evalhist import EvalHist
@@ -14,18 +14,37 @@ from modelsel   import ModelSelect
 from modules.runqueue import RunQueue
 from modules.evalprog import EvaluationProgess  
 from modules.score import ScoreTable
+from modules.livedata import LiveData
+from modules.metrics import Metrics
+from modules.curvestore import CurveStore
+from modules.download import FileDownload
 
 class Routes:
 
-    accPrecision = 5
-    
     @classmethod
     def setup(cls, app:Flask, modelSel:ModelSelect, runQueue:RunQueue, 
               evalProg:EvaluationProgess, scoreTable:ScoreTable, evalHist:EvalHist, 
               homePageFN:str, uploadFolder:str, maxContentLen:int, 
               evalDatasetName:str, trainDatasetFN:str, 
-              challengeEnd:datetime)->None:
+              challengeEnd:datetime, liveData:LiveData, curveStore:CurveStore=None,
+              trainDownload:FileDownload=None)->None:
+
+        if trainDownload is None:
+            trainDownload = FileDownload()
+        trainDownload.warm(trainDatasetFN)
         
+        #Time route handlers, labelled by route rule to keep metrics bounded
+        @app.before_request
+        def startTimer():
+            g.start = time.perf_counter()
+
+        @app.after_request
+        def stopTimer(response:Response):
+            if request.url_rule is not None and 'start' in g:
+                Metrics.route(request.url_rule.rule, time.perf_counter()-g.start)
+            return response
+
+
         @app.route('/')  # by default method is GET
         def home():
             #Clear data on load or reset
@@ -84,23 +103,36 @@ class Routes:
                     #return render('Invalid model file', 'darkred')
                 else:
                 # Add model to run queue
-                    runQueue.add(filename)
-                    return render('Model uploaded', 'green')
+                    superseded = runQueue.add(filename, model.costPerInput(), model.costFamily())
+                    if len(superseded) == 0:
+                        return render('Model uploaded', 'green')
+                    #same tag was waiting: it is evaluated once, with this upload
+                    for oldFN in superseded:
+                        if oldFN != filename:       #same name was overwritten by this upload
+                            try:
+                                os.remove(os.path.join(uploadFolder, oldFN))
+                            except OSError:
+                                pass
+                    Metrics.inc('queue_coalesced_total', len(superseded))
+                    return render('Model uploaded, replaces the previous upload still waiting in queue', 'green')
                 
                                 
         @app.route('/howto')
         def howto():
-            return render_template('howto.html')
+            return render_template('howto.html', variants=FileDownload.available(trainDatasetFN))
         #or: app.add_url_rule('/howto', view_func=howto)
 
         @app.route('/help')
         def help():
             return render_template('help.html')
 
+        #?format=gz or npz for the prebuilt variants
         @app.route('/traindataset', methods=['GET', 'POST'])
         def dntrainset():
-            #or: return send_from_directory(<path_to_folder>, <filename>)
-            return send_file(trainDatasetFN)
+            fn = FileDownload.variant(trainDatasetFN, request.args.get('format', 'pickle'))
+            if fn is None:
+                return Response('No such train dataset format', status=404, mimetype='text/plain')
+            return trainDownload.send(fn)
 
         @app.route('/_time')  # long pooling test
         def time2():
@@ -112,54 +144,42 @@ class Routes:
 
         @app.route('/_timeleft')  # by default method is GET
         def timeleft():
-            if challengeEnd < datetime.now():
-                timeleft='00:00:00'
-            else:
-                td:timedelta = (challengeEnd-datetime.now())
-                hours, remainder = divmod(int(td.total_seconds()), 3600)
-                minutes, seconds = divmod(remainder, 60)
-                timeleft='{:d}:{:02d}:{:02d}'.format(hours, minutes, seconds)
-            return jsonify(time=timeleft, set=evalDatasetName)
+            return jsonify(**liveData.timeleft())
 
 
         @app.route('/_waiters')
         def waiters():
-            waiters = runQueue.waiting()
-            top3waiters = waiters[:3]
-            return jsonify(waiters=top3waiters)
+            return jsonify(**liveData.waiters())
 
 
+        #?set=name selects the score table of an additional dataset
         @app.route('/_ranking')
         def ranking():
-            #Shared EvaluationProgress instance
-            if evalProg.complete() and \
-               evalProg.position() != '' and \
-               evalProg.position() > 0:
-                hl =  evalProg.position()  #highlight table position
-            else:
-                hl = -1  #out of table: do not highlight
-
-            #set acc precision for rank table
-            l = scoreTable.get()
-            score = [ [e[0], "{0:.{1:}f}".format(e[1], Routes.accPrecision), e[2]] 
-                    for e in l]
-                    
-            return jsonify(rank=score, highlight=hl)
+            data = liveData.ranking(request.args.get('set'))
+            if data is None:
+                return jsonify(error='unknown dataset'), 404
+            return jsonify(**data)
 
 
         @app.route('/_running')
         def running():
-            #Shared EvaluationProgress instance
-            [topName, topHist, data] = scoreTable.top()
-
-            #Format batch counter
-            curBatch, batches = evalProg.batch()
-            batchCounter = "{0:0{1:d}d}/{2:d}". \
-            format(curBatch+1, len(str(batches)), batches)
-
-            return jsonify(tag=evalProg.tag(), acc=evalProg.evalAcc(),
-                           position=evalProg.position(), batches=batchCounter, 
-                           topHist=topHist, topName=topName)
+            return Response(liveData.running(), mimetype='application/json')
+
+        #accuracy curve of a past evaluation of tag, the last one or ?date=yyyy-mm-dd hh:mm:ss
+        #points as in /_running topHist: x-axis [0-100], accuracy (%)
+        @app.route('/_curve/<tag>')
+        def curve(tag:str):
+            found = curveStore.curve(tag, request.args.get('date')) if curveStore is not None else None
+            if found is None:
+                return jsonify(error='no curve stored for ' + tag), 404
+            date, acc = found
+            x = [i*100/(len(acc)-1) if len(acc) > 1 else 100 for i in range(len(acc))]
+            points = [[round(a, 3), round(float(b)*100, LiveData.accPrecision)] for a, b in zip(x, acc)]
+            return jsonify(tag=tag, date=date, runs=curveStore.runs(tag), curve=points)
+
+        @app.route('/_metrics')
+        def metrics():
+            return Response(Metrics.prometheus(), mimetype='text/plain; version=0.0.4')
 
         #download evaluation history raw text file
         @app.route('/hist.csv')